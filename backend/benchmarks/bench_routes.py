@@ -0,0 +1,461 @@
+"""Load-test every API route and record throughput and latency baselines.
+
+The script seeds a synthetic catalog into its own database, then sends a fixed
+number of requests to each route in api_router, either to the app in process
+(through httpx's ASGI transport) or to a uvicorn server it starts. Product images
+point at a local fixture server on --image-port, so image routes work offline. Image pair
+validation is off unless --validation is given, so write routes measure the API
+rather than remote image hosts.
+
+For each route it reports req/s, p50/p95/p99 latency and, in process, the mean
+peak of Python allocations per request. Results are written as JSON. Pass
+--compare with an earlier result to see the change per route; the exit status
+is 1 if any route regressed by more than --tolerance.
+
+    python backend/benchmarks/bench_routes.py --products 100000
+    python backend/benchmarks/bench_routes.py --products 100000 --compare baselines/inprocess-100000.json
+    python backend/benchmarks/bench_routes.py --mode uvicorn --workers 4 --products 1000000 --reuse
+
+It needs a MongoDB at MONGO_URL. Routes that would disturb the run are listed in
+SKIPPED; adding a route without a scenario or a SKIPPED entry is an error.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+from PIL import Image, ImageDraw
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+# Metrics compared against a baseline, and whether a higher value is worse
+COMPARED_METRICS = (("req_per_s", False), ("p95_ms", True), ("p99_ms", True), ("alloc_kib_per_request", True))
+
+
+# Fixture images
+
+def fixture_image() -> bytes:
+    image = Image.new("RGB", (1200, 1200), (236, 226, 208))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((300, 300, 900, 900), outline=(191, 149, 63), width=60)
+    draw.ellipse((560, 220, 640, 300), fill=(180, 210, 240))
+    buffer = BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def serve_fixture_images(port: int):
+    body = fixture_image()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+
+        def do_GET(self):
+            self.do_HEAD()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    image_server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=image_server.serve_forever, daemon=True).start()
+    return image_server, f"http://127.0.0.1:{image_server.server_address[1]}"
+
+
+# Scenarios
+# Each builds one request from the run context; requests are varied so that caches
+# see a realistic mix of hits and misses rather than a single hot key.
+
+class Context:
+    def __init__(self, product_ids: list, disposable_ids: list, image_base: str, categories: list, words: list):
+        self.product_ids = product_ids
+        self.disposable_ids = disposable_ids
+        self.image_base = image_base
+        self.categories = categories
+        self.words = words
+        self.rng = random.Random(1)
+
+    def product_id(self) -> str:
+        return self.rng.choice(self.product_ids)
+
+    def new_product(self) -> dict:
+        index = uuid.uuid4().hex
+        return {
+            "name": f"Benchmark {self.rng.choice(self.words)} Ring {index[:8]}",
+            "description": "Created by the route benchmark.",
+            "price": round(self.rng.uniform(100, 5000), 2),
+            "category": self.rng.choice(self.categories),
+            "image_url": f"{self.image_base}/product/new-{index}.jpg",
+            "model_image_url": f"{self.image_base}/model/new-{index}.jpg",
+            "material_details": {"material": "18k Gold", "weight": "5.0g"},
+        }
+
+
+def listing_params(ctx: Context) -> dict:
+    return ctx.rng.choice([
+        {"limit": 24},
+        {"limit": 24, "category": ctx.rng.choice(ctx.categories)},
+        {"limit": 24, "sort": "price"},
+        {"limit": 24, "sort": "-price", "min_price": 500, "max_price": 5000},
+        {"limit": 24, "fields": "id,name,price,image_url"},
+    ])
+
+
+def bulk_body(ctx: Context) -> str:
+    lines = [{"op": "update", "id": ctx.product_id(), "product": {"price": round(ctx.rng.uniform(100, 5000), 2)}}
+             for _ in range(50)]
+    return "\n".join(json.dumps(line) for line in lines)
+
+
+SCENARIOS = {
+    "GET /api/": lambda ctx: {"url": "/api/"},
+    "GET /api/products": lambda ctx: {"url": "/api/products", "params": listing_params(ctx)},
+    "GET /api/products/featured": lambda ctx: {"url": "/api/products/featured", "params": {"limit": 24}},
+    "GET /api/products/search": lambda ctx: {
+        "url": "/api/products/search",
+        "params": {"q": f"{ctx.rng.choice(ctx.words)} {ctx.rng.choice(ctx.categories)[:-1]}".lower()},
+    },
+    "GET /api/products/suggest": lambda ctx: {
+        "url": "/api/products/suggest", "params": {"q": ctx.rng.choice(ctx.words)[:ctx.rng.randint(1, 4)].lower()},
+    },
+    "GET /api/products/categories": lambda ctx: {"url": "/api/products/categories"},
+    "GET /api/products/{product_id}": lambda ctx: {"url": f"/api/products/{ctx.product_id()}"},
+    "POST /api/products": lambda ctx: {"url": "/api/products", "json": ctx.new_product()},
+    "PUT /api/products/{product_id}": lambda ctx: {
+        "url": f"/api/products/{ctx.product_id()}", "json": {"price": round(ctx.rng.uniform(100, 5000), 2)},
+    },
+    "DELETE /api/products/{product_id}": lambda ctx: {"url": f"/api/products/{ctx.disposable_ids.pop()}"},
+    "POST /api/products/bulk": lambda ctx: {
+        "url": "/api/products/bulk", "content": bulk_body(ctx), "headers": {"Content-Type": "application/x-ndjson"},
+    },
+    "GET /api/admin/images/duplicates": lambda ctx: {"url": "/api/admin/images/duplicates"},
+    "GET /api/admin/slow-queries": lambda ctx: {"url": "/api/admin/slow-queries"},
+    "GET /api/admin/images/health": lambda ctx: {"url": "/api/admin/images/health", "params": {"status": "ok"}},
+    "GET /api/images/{product_id}/{kind}": lambda ctx: {
+        "url": f"/api/images/{ctx.product_id()}/{ctx.rng.choice(['image', 'model'])}",
+        "params": {"w": ctx.rng.choice([320, 640, 1280])},
+    },
+    "POST /api/contact": lambda ctx: {
+        "url": "/api/contact",
+        "json": {"name": "Benchmark", "email": "bench@example.com", "message": "Route benchmark enquiry"},
+    },
+    # Adds the sample products once, then only finds them present
+    "POST /api/init-data": lambda ctx: {"url": "/api/init-data"},
+    "GET /api/contacts": lambda ctx: {"url": "/api/contacts"},
+    "GET /api/contacts/export": lambda ctx: {
+        "url": "/api/contacts/export", "params": {"format": ctx.rng.choice(["ndjson", "csv"])},
+    },
+}
+
+SKIPPED = {
+    "POST /api/admin/images/health/crawl": "starts a background crawl of every product image",
+}
+
+
+def api_routes(server) -> list:
+    routes = [f"{method} {route.path}" for route in server.api_router.routes for method in sorted(route.methods)]
+    missing = [route for route in routes if route not in SCENARIOS and route not in SKIPPED]
+    if missing:
+        raise SystemExit(f"No benchmark scenario for {', '.join(missing)}; add one to SCENARIOS or SKIPPED")
+    return routes
+
+
+# Measurement
+
+async def send(client: httpx.AsyncClient, route: str, ctx: Context) -> int:
+    method = route.split(" ", 1)[0]
+    request = SCENARIOS[route](ctx)
+    response = await client.request(
+        method,
+        request["url"],
+        params=request.get("params"),
+        json=request.get("json"),
+        content=request.get("content"),
+        headers=request.get("headers"),
+    )
+    return response.status_code
+
+
+async def measure(client: httpx.AsyncClient, route: str, ctx: Context, requests: int, concurrency: int) -> dict:
+    latencies, statuses = [], Counter()
+    pending = iter(range(requests))
+
+    async def worker():
+        for _ in pending:
+            started = time.perf_counter()
+            status = await send(client, route, ctx)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": requests,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "req_per_s": round(requests / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(cuts[49], 3),
+        "p95_ms": round(cuts[94], 3),
+        "p99_ms": round(cuts[98], 3),
+        "max_ms": round(max(latencies), 3),
+    }
+
+
+async def allocations(client: httpx.AsyncClient, route: str, ctx: Context, samples: int) -> float:
+    # Peak traced memory above the starting point, per request, sent one at a time
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await send(client, route, ctx)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return round(statistics.fmean(peaks) / 1024, 1)
+
+
+# Setup
+
+async def seed(seeding, database, args, image_base: str):
+    if not args.reuse:
+        await database.products.delete_many({})
+        await database.seed_runs.delete_many({})
+    started = time.perf_counter()
+    inserted = await seeding.seed_products(database, args.products, image_base=image_base)
+    print(f"Seeded {inserted} products in {time.perf_counter() - started:.1f}s")
+
+    await database.contacts.delete_many({})
+    created = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
+    await database.contacts.insert_many([
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Customer {index}",
+            "email": f"customer{index}@example.com",
+            "phone": None,
+            "message": "Is this piece available in rose gold?",
+            "created_at": created + timedelta(seconds=index),
+        }
+        for index in range(args.contacts)
+    ])
+
+
+async def disposable_products(seeding, database, count: int, image_base: str) -> list:
+    # The delete scenario removes products of its own, never the seeded ones
+    products = seeding.generate_products(0, count, seed=time.time_ns(), image_base=image_base)
+    await database.products.insert_many(products, ordered=False)
+    return [product["id"] for product in products]
+
+
+async def sample_ids(database, count: int) -> list:
+    pipeline = [{"$sample": {"size": count}}, {"$project": {"_id": 0, "id": 1}}]
+    return [product["id"] async for product in database.products.aggregate(pipeline)]
+
+
+def start_uvicorn(args) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", "server:app",
+        "--host", "127.0.0.1", "--port", str(args.port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=os.environ.copy())
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/api/")
+            if response.status_code == 200 and response.json()["mongodb_status"] == "connected":
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit(f"Server did not become ready within {timeout:.0f}s")
+
+
+# Reporting
+
+def compare(result: dict, baseline: dict, tolerance: float):
+    changes, regressions = {}, []
+    for route, current in result["routes"].items():
+        previous = baseline["routes"].get(route)
+        if not previous or "skipped" in current or "skipped" in previous:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS:
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            changes.setdefault(route, {})[metric] = change
+            if (change if higher_is_worse else -change) > tolerance:
+                regressions.append(f"{route} {metric}: {before} -> {after} ({change:+.0%})")
+    return changes, regressions
+
+
+def print_table(result: dict, changes: dict):
+    print(f"\n{'route':<40} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'KiB/req':>9} {'errors':>7}")
+    for route, stats in result["routes"].items():
+        if "skipped" in stats:
+            print(f"{route:<40} skipped: {stats['skipped']}")
+            continue
+        alloc = stats.get("alloc_kib_per_request")
+        print(
+            f"{route:<40} {stats['req_per_s']:>9.1f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+            f"{stats['p99_ms']:>9.2f} {'-' if alloc is None else f'{alloc:.1f}':>9} {stats['errors']:>7}"
+        )
+        change = changes.get(route)
+        if change:
+            print(" " * 40 + "  " + "  ".join(f"{metric} {value:+.1%}" for metric, value in change.items()))
+
+
+# Main
+
+async def run(args):
+    image_server, image_base = serve_fixture_images(args.image_port)
+    # server reads its configuration at import time
+    os.environ["DB_NAME"] = args.db
+    os.environ["IMAGE_VALIDATION_MODE"] = args.validation
+    os.environ["IMAGE_HEALTH_INTERVAL"] = "0"
+    # Startup would otherwise fingerprint every seeded image while routes are timed
+    os.environ["IMAGE_BACKFILL_CONCURRENCY"] = "0"
+    # The fixture images are served from loopback, which image fetches refuse by default
+    os.environ["IMAGE_ALLOWED_HOSTS"] = "127.0.0.1"
+    os.environ.setdefault("IMAGE_CACHE_DIR", tempfile.mkdtemp(prefix="bench-image-cache-"))
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+    import seed as seeding
+
+    routes = api_routes(server)
+    database = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))[args.db]
+    disposable = args.warmup + args.requests + (args.alloc_samples if args.mode == "inprocess" else 0)
+    await seed(seeding, database, args, image_base)
+    product_ids = await sample_ids(database, 1000)
+    disposable_ids = await disposable_products(seeding, database, disposable, image_base)
+    ctx = Context(product_ids, disposable_ids, image_base, list(seeding.CATEGORY_WEIGHTS), list(seeding.STYLES))
+
+    process = None
+    if args.mode == "inprocess":
+        await server.startup_db_client()
+        if server.db is None:
+            raise SystemExit("MongoDB is not reachable at MONGO_URL")
+        transport = httpx.ASGITransport(app=server.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+    else:
+        process = start_uvicorn(args)
+        client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}",
+            timeout=60,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        )
+        await wait_until_ready(client, args.startup_timeout)
+
+    result = {
+        "meta": {
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "uvicorn" else 1,
+            "products": args.products,
+            "contacts": args.contacts,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "validation": args.validation,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "routes": {},
+    }
+    try:
+        for route in routes:
+            if route in SKIPPED:
+                result["routes"][route] = {"skipped": SKIPPED[route]}
+                continue
+            if args.routes and not any(name in route for name in args.routes):
+                continue
+            for _ in range(args.warmup):
+                await send(client, route, ctx)
+            stats = await measure(client, route, ctx, args.requests, args.concurrency)
+            if args.mode == "inprocess":
+                stats["alloc_kib_per_request"] = await allocations(client, route, ctx, args.alloc_samples)
+            result["routes"][route] = stats
+            print(f"{route:<40} {stats['req_per_s']:>9.1f} req/s  p95 {stats['p95_ms']:.2f} ms")
+    finally:
+        await client.aclose()
+        if process:
+            process.terminate()
+            process.wait()
+        else:
+            await server.shutdown_db_client()
+        image_server.shutdown()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--products", type=int, default=1000, help="synthetic catalog size")
+    parser.add_argument("--contacts", type=int, default=1000)
+    parser.add_argument("--reuse", action="store_true", help="keep the seeded catalog, only adding missing products")
+    parser.add_argument("--db", default="premium_jewelry_bench", help="database seeded and used by the run")
+    parser.add_argument("--requests", type=int, default=500, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--alloc-samples", type=int, default=50, help="requests traced for allocations (in process)")
+    parser.add_argument("--routes", nargs="*", help="only routes containing one of these strings")
+    parser.add_argument("--validation", choices=("off", "lenient", "strict"), default="off")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--image-port", type=int, default=8101, help="fixture image server")
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--output", type=Path, help="defaults to baselines/<mode>-<products>.json")
+    parser.add_argument("--compare", type=Path, help="earlier result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed regression before failing")
+    args = parser.parse_args()
+    if args.db == "premium_jewelry":
+        parser.error("--db must not be the application database; the run replaces its products and contacts")
+
+    result = asyncio.run(run(args))
+    changes, regressions = {}, []
+    if args.compare:
+        changes, regressions = compare(result, json.loads(args.compare.read_text()), args.tolerance)
+    print_table(result, changes)
+
+    output = args.output or BASELINE_DIR / f"{args.mode}-{args.products}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2, sort_keys=True) + "\n")
+    print(f"\nWrote {output}")
+    if regressions:
+        print("\nRegressions beyond tolerance:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Check full-text search latency on a large synthetic catalog.
+
+Builds the in-process search index from --products products generated like
+backend/seed.py does, then runs each query --rounds times and reports p50/p99.
+The exit status is 1 if any query's p99 exceeds --budget-ms, the search target.
+It does not need a database.
+
+    python backend/benchmarks/bench_search.py --products 100000
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import seed  # noqa: E402
+import server  # noqa: E402
+
+# Common, correlated terms are the slow case: their posting lists are long and
+# most products in one also appear in the others
+QUERIES = (
+    "ring", "sapphire", "gold ring", "silver ring", "diamond necklace", "white gold ring",
+    "natural diamond earring", "rose gold pendant", "classic gold", "italy",
+    "vintage silver bracelet pearl", "emerald royal necklace",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--count", type=int, default=21, help="results ranked per query (limit + 1)")
+    parser.add_argument("--budget-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    index = server.ProductSearchIndex()
+    started = time.perf_counter()
+    for product in seed.generate_products(0, args.products):
+        index.add(product, sort=False)
+    index.finish_bulk_load()
+    print(f"Indexed {args.products} products in {time.perf_counter() - started:.1f}s")
+    # Leave the collection of the build's garbage out of the first query
+    gc.collect()
+
+    over_budget = []
+    for query in QUERIES:
+        samples = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            index.search(query, args.count)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        p99 = samples[max(int(len(samples) * 0.99) - 1, 0)]
+        print(f"{query:<32} p50 {statistics.median(samples):8.3f} ms   p99 {p99:8.3f} ms")
+        if p99 > args.budget_ms:
+            over_budget.append(query)
+    if over_budget:
+        print(f"Over the {args.budget_ms} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compare product serialization before and after the fast path.
+
+The old path built a Product per document, let FastAPI validate the list again
+against the response_model and encoded it with json; ETags were hashed from a
+second jsonable_encoder pass. The fast path reshapes the projected documents and
+encodes them once with orjson, hashing the same bytes.
+
+    python backend/benchmarks/bench_serialization.py --products 100 --rounds 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import server  # noqa: E402
+
+
+def synthetic_documents(count: int) -> list:
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Synthetic Piece {index}",
+            "description": "Hand-finished piece used for serialization benchmarks. " * 3,
+            "price": 100.0 + index,
+            "category": ("rings", "necklaces", "earrings", "bracelets")[index % 4],
+            "image_url": f"https://images.example.com/products/{index}.jpg",
+            "model_image_url": f"https://images.example.com/models/{index}.jpg",
+            "material_details": {"metal": "18k gold", "stones": ["diamond"], "weight": "4.2g"},
+            "is_featured": index % 7 == 0,
+            "created_at": start + timedelta(minutes=index),
+            "validation_status": "validated",
+            "image_health": {"image_url": {"status": "ok", "checked_at": start}},
+            "version": 1,
+        }
+        for index in range(count)
+    ]
+
+
+def model_path(documents: list, adapter: TypeAdapter) -> bytes:
+    products = [server.Product(**document) for document in documents]
+    content = adapter.dump_python(adapter.validate_python(products), mode="json")
+    body = json.dumps(content, separators=(",", ":")).encode()
+    payload = json.dumps([jsonable_encoder(products), None], sort_keys=True, separators=(",", ":"))
+    server.hashlib.sha256(payload.encode()).hexdigest()
+    return body
+
+
+def fast_path(documents: list, adapter: TypeAdapter) -> bytes:
+    body = server.encode_json(server.product_documents(documents, None))
+    server.compute_etag(body)
+    return body
+
+
+def measure(label: str, encode, documents: list, adapter: TypeAdapter, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        encode(documents, adapter)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    median = statistics.median(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<12} median {median:8.3f} ms   p95 {p95:8.3f} ms")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100, help="documents per response")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    documents = synthetic_documents(args.products)
+    adapter = TypeAdapter(List[server.Product])
+    # Both paths must produce the same JSON
+    assert json.loads(model_path(documents, adapter)) == json.loads(fast_path(documents, adapter))
+
+    print(f"{args.products} products per response, {args.rounds} rounds")
+    before = measure("model path", model_path, documents, adapter, args.rounds)
+    after = measure("fast path", fast_path, documents, adapter, args.rounds)
+    print(f"speedup      {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
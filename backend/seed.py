@@ -0,0 +1,188 @@
+"""Seed a products collection with a large synthetic catalog.
+
+    python backend/seed.py --products 1000000
+    python backend/seed.py --products 1000000 --seed 7   # another, independent catalog
+    python backend/seed.py --samples                      # only reconcile the sample products
+
+Generated products have ids derived from --seed and their position, so a run can
+be repeated or extended: products already present are skipped, and raising
+--products only inserts the new ones. Progress is recorded per seed in the
+seed_runs collection, but only as a hint: chunks it reports as loaded are
+counted in the products collection and regenerated if any are missing. Chunks of
+--chunk-size products are inserted with --parallel concurrent insert_many calls,
+while worker processes generate the next chunks; on an empty collection the
+secondary indexes are built once the products are loaded, which is much faster
+than maintaining them during the load.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+
+import server
+
+# Share of the catalog per category, and its log-normal price parameters (mu, sigma)
+CATEGORY_WEIGHTS = {
+    "Rings": (0.32, 7.4, 0.6),
+    "Necklaces": (0.24, 7.6, 0.7),
+    "Earrings": (0.2, 7.1, 0.6),
+    "Bracelets": (0.14, 7.3, 0.6),
+    "Pendants": (0.1, 6.9, 0.5),
+}
+MATERIALS = ("18k Gold", "18k Yellow Gold", "18k White Gold", "18k Rose Gold", "Sterling Silver")
+MATERIAL_WEIGHTS = (0.3, 0.2, 0.2, 0.15, 0.15)
+GEMSTONES = ("Natural Diamonds", "Premium Diamonds", "Sapphires & Diamonds", "Emeralds", "Rubies", "Pearls", "None")
+GEMSTONE_WEIGHTS = (0.25, 0.15, 0.1, 0.1, 0.1, 0.1, 0.2)
+ORIGINS = ("Italy", "Switzerland", "Belgium", "France", "Denmark", "India", "Thailand")
+STYLES = ("Classic", "Vintage", "Royal", "Eternal", "Delicate", "Twisted", "Halo", "Minimalist", "Celestial", "Heritage")
+FEATURED_RATIO = 0.05
+SEED_EPOCH = datetime(2024, 1, 1)
+
+
+def sample_images() -> dict:
+    # Generated products reuse real sample image pairs of their category
+    pairs = {}
+    for sample in server.SAMPLE_PRODUCTS:
+        pairs.setdefault(sample["category"], []).append((sample["image_url"], sample["model_image_url"]))
+    return pairs
+
+
+def seed_product_id(seed: int, index: int) -> str:
+    return str(uuid.UUID(bytes=hashlib.md5(f"seed:{seed}:{index}".encode()).digest(), version=4))
+
+
+def generate_products(start: int, count: int, seed: int = 0, featured_ratio: float = FEATURED_RATIO,
+                      image_base: str = None) -> list:
+    """Products start..start+count of catalog `seed`; the same arguments give the same products."""
+    rng = random.Random(f"{seed}:{start}")
+    # One draw per field for the whole chunk is several times faster than per product
+    categories = rng.choices(list(CATEGORY_WEIGHTS), [weight for weight, _, _ in CATEGORY_WEIGHTS.values()], k=count)
+    materials = rng.choices(MATERIALS, MATERIAL_WEIGHTS, k=count)
+    gemstones = rng.choices(GEMSTONES, GEMSTONE_WEIGHTS, k=count)
+    styles = rng.choices(STYLES, k=count)
+    origins = rng.choices(ORIGINS, k=count)
+    images = sample_images()
+    products = []
+    for offset, category in enumerate(categories):
+        index = start + offset
+        _, mu, sigma = CATEGORY_WEIGHTS[category]
+        material, gemstone, style, kind = materials[offset], gemstones[offset], styles[offset], category[:-1]
+        if image_base:
+            image_url, model_image_url = f"{image_base}/product/{index}.jpg", f"{image_base}/model/{index}.jpg"
+        else:
+            image_url, model_image_url = rng.choice(images.get(category) or images["Rings"])
+        products.append({
+            "id": seed_product_id(seed, index),
+            "name": f"{style} {material.split()[-1]} {kind} {index:07d}",
+            "description": f"{style} {kind.lower()} in {material.lower()}"
+                           + (f" set with {gemstone.lower()}." if gemstone != "None" else "."),
+            "price": round(min(rng.lognormvariate(mu, sigma), 50000.0), 2),
+            "category": category,
+            "image_url": image_url,
+            "model_image_url": model_image_url,
+            "material_details": {
+                "material": material,
+                "gemstones": gemstone,
+                "weight": f"{rng.uniform(1.5, 25):.1f}g",
+                "origin": origins[offset],
+            },
+            "is_featured": rng.random() < featured_ratio,
+            "validation_status": "validated",
+            "validation_detail": None,
+            "version": 1,
+            "created_at": SEED_EPOCH + timedelta(seconds=index),
+        })
+    return products
+
+
+async def insert_chunk(collection, products: list) -> int:
+    try:
+        result = await collection.insert_many(products, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        # Products left by an interrupted run already have their ids
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        return e.details.get("nInserted", 0)
+
+
+async def seed_products(database, count: int, seed: int = 0, chunk_size: int = 10000, parallel: int = 8,
+                        featured_ratio: float = FEATURED_RATIO, image_base: str = None) -> int:
+    """Grow catalog `seed` to `count` products; returns how many were inserted."""
+    # Chunks the ledger reports as loaded may have been deleted since, so they are
+    # counted before being skipped; the rest are inserted without checking
+    run = await database.seed_runs.find_one({"_id": seed}) or {}
+    loaded = run.get("count", 0)
+    # Duplicate ids from an interrupted run are only detected through this index
+    await database.products.create_index([("id", 1)], unique=True)
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(parallel)
+
+    async def load(offset: int) -> int:
+        async with slots:
+            size = min(chunk_size, count - offset)
+            if offset < loaded:
+                ids = [seed_product_id(seed, index) for index in range(offset, offset + size)]
+                if await database.products.count_documents({"id": {"$in": ids}}) == size:
+                    return 0
+            products = await loop.run_in_executor(
+                generators, generate_products, offset, size, seed, featured_ratio, image_base
+            )
+            return await insert_chunk(database.products, products)
+
+    # Generating products is CPU-bound, so chunks are built in worker processes; on a
+    # single core, shipping them back costs more than it saves
+    processes = min(parallel, os.cpu_count() or 1)
+    generators = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+    try:
+        inserted = sum(await asyncio.gather(*(load(offset) for offset in range(0, count, chunk_size))))
+    finally:
+        if generators:
+            generators.shutdown()
+    await database.seed_runs.update_one(
+        {"_id": seed}, {"$max": {"count": count}, "$set": {"updated_at": datetime.utcnow()}}, upsert=True
+    )
+    return inserted
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=0, help="catalog size to reach")
+    parser.add_argument("--seed", type=int, default=0, help="which synthetic catalog to generate")
+    parser.add_argument("--featured-ratio", type=float, default=FEATURED_RATIO)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--parallel", type=int, default=8, help="concurrent insert_many calls")
+    parser.add_argument("--samples", action="store_true", help="also reconcile the sample products")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    database = client[os.environ.get("DB_NAME", "premium_jewelry")]
+    try:
+        if args.products:
+            started = time.perf_counter()
+            inserted = await seed_products(
+                database, args.products, args.seed, args.chunk_size, args.parallel, args.featured_ratio
+            )
+            print(f"Inserted {inserted} products in {time.perf_counter() - started:.1f}s")
+        if args.samples:
+            result = await server.reconcile_sample_products(database, update=True)
+            print(f"Sample products inserted: {len(result['inserted'])}, updated: {len(result['updated'])}")
+        started = time.perf_counter()
+        created = await server.ensure_indexes(database)
+        if created:
+            print(f"Built {len(created)} indexes in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
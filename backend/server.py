@@ -1,15 +1,39 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+import httpx
+import numpy as np
+import orjson
+from PIL import Image, ImageOps
+from pymongo import InsertOne, UpdateOne, UpdateMany, DeleteOne, ReturnDocument, WriteConcern, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Literal, NamedTuple, Optional
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import asyncio
+import base64
+import csv
+import json
+import hashlib
+import io
+import time
+import re
+import math
+import random
+import heapq
+import ipaddress
+import socket
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from bisect import bisect_left, insort
+from urllib.parse import urlsplit
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -22,7 +46,11 @@ async def connect_to_mongo():
     for attempt in range(max_retries):
         try:
             mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-            client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=5000)
+            client = AsyncIOMotorClient(
+                mongo_url,
+                serverSelectionTimeoutMS=5000,
+                event_listeners=[MongoCommandMetrics(), MongoPoolMetrics(), SlowQueryListener()],
+            )
             # Test the connection
             await client.admin.command('ping')
             db = client[os.environ.get('DB_NAME', 'premium_jewelry')]
@@ -48,7 +76,76 @@ app = FastAPI(title="Premium Jewelry API", description="Luxury jewelry store bac
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Server-Timing
+# Handlers wrap their phases in `with Span("db"):` and the like. A request's phase
+# durations are collected in a context variable and returned in a Server-Timing
+# header next to the request total, so browser devtools and access logs show where
+# the time went. Outside a request (background workers) a span is a no-op.
+# SERVER_TIMING_LOG_SAMPLE logs that fraction of requests' timings as JSON.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'true').lower() == 'true'
+SERVER_TIMING_LOG_SAMPLE = float(os.environ.get('SERVER_TIMING_LOG_SAMPLE', '0'))
+
+request_timings: ContextVar[Optional[dict]] = ContextVar("request_timings", default=None)
+
+class Span:
+    __slots__ = ("name", "timings", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = request_timings.get()
+        if self.timings is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings[self.name] = self.timings.get(self.name, 0.0) + time.perf_counter() - self.started
+
+def server_timing_header(timings: dict, total: float) -> str:
+    phases = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    return ", ".join(phases + [f"total;dur={total * 1000:.1f}"])
+
+class ServerTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SERVER_TIMING:
+            await self.app(scope, receive, send)
+            return
+        timings = {}
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing_header(timings, time.perf_counter() - started)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            if SERVER_TIMING_LOG_SAMPLE and random.random() < SERVER_TIMING_LOG_SAMPLE:
+                route = scope.get("route")
+                logger.info(json.dumps({
+                    "event": "request_timing",
+                    "method": scope["method"],
+                    "route": route.path if route is not None else scope["path"],
+                    "status": status,
+                    "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in timings.items()},
+                }))
+
 # Define Models
+ValidationStatus = Literal["pending", "validated", "rejected"]
+
 class Product(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -59,6 +156,10 @@ class Product(BaseModel):
     model_image_url: str
     material_details: dict
     is_featured: bool = False
+    validation_status: ValidationStatus = "validated"
+    validation_detail: Optional[str] = None
+    # image_health is stored by the crawler but only served by the admin report
+    version: int = 1
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class ProductCreate(BaseModel):
@@ -81,6 +182,29 @@ class ProductUpdate(BaseModel):
     material_details: Optional[dict] = None
     is_featured: Optional[bool] = None
 
+class BulkOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[str] = None
+    product: Optional[dict] = None
+
+class BulkItemResult(BaseModel):
+    index: int
+    op: Optional[str] = None
+    id: Optional[str] = None
+    status: int
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    failed: int = 0
+    items: List[BulkItemResult] = []
+
+class Suggestion(BaseModel):
+    text: str
+    kind: str
+
 class Contact(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -95,128 +219,2386 @@ class ContactCreate(BaseModel):
     phone: Optional[str] = None
     message: str
 
+# Keyset pagination helpers
+# Products are listed in (sort field, id) order so every page is a range scan on the
+# matching compound index instead of a skip over all previous pages.
+DEFAULT_PAGE_SIZE = int(os.environ.get('PRODUCTS_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = 1000
+PRODUCT_SORT = [("created_at", 1), ("id", 1)]
+
+# Only these fields may be sorted on; each one has its own index (see INDEXES below)
+PRODUCT_SORT_FIELDS = ("created_at", "price", "name")
+
+def product_sort_spec(sort: str) -> list:
+    direction = -1 if sort.startswith("-") else 1
+    field = sort[1:] if direction == -1 else sort
+    if field not in PRODUCT_SORT_FIELDS:
+        allowed = ", ".join(f"{name}, -{name}" for name in PRODUCT_SORT_FIELDS)
+        raise HTTPException(status_code=400, detail=f"Unsupported sort '{sort}'. Allowed: {allowed}")
+    return [(field, direction), ("id", direction)]
+
+CURSOR_VALUE_TYPES = {"created_at": datetime, "price": (int, float), "name": str}
+
+def sort_name(sort_spec: list) -> str:
+    field, direction = sort_spec[0]
+    return field if direction == 1 else f"-{field}"
+
+# Cursors record the sort that produced them: a position in one order means nothing
+# in another, so reusing a cursor with a different sort is rejected
+def encode_cursor(product: dict, sort_spec: list) -> str:
+    value = product[sort_spec[0][0]]
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_name(sort_spec), value, product["id"]])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_spec: list) -> dict:
+    field, direction = sort_spec[0]
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort, value, product_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if field == "created_at" and sort == sort_name(sort_spec):
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    if sort != sort_name(sort_spec):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Pagination cursor was issued for sort '{sort}', not '{sort_name(sort_spec)}'",
+        )
+    # Both values end up in the filter, so anything but a plain value of the sort
+    # field's type (a dict would be read as query operators) is rejected
+    if not isinstance(product_id, str) or not isinstance(value, CURSOR_VALUE_TYPES[field]) \
+            or isinstance(value, bool):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    op = "$gt" if direction == 1 else "$lt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "id": {op: product_id}},
+    ]}
+
+async def fetch_product_page(
+    query: dict, sort_spec: list, limit: int, cursor: Optional[str], projection: Optional[dict] = None
+):
+    if cursor:
+        after = decode_cursor(cursor, sort_spec)
+        query = {"$and": [query, after]} if query else after
+    # Read one extra document to know whether another page exists
+    products = await db.products.find(query, projection).sort(sort_spec).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(products[limit - 1], sort_spec) if len(products) > limit else None
+    return products[:limit], next_cursor
+
+def build_product_query(
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    is_featured: Optional[bool] = None,
+    validation_status: Optional[str] = None,
+) -> dict:
+    query = {}
+    if category is not None:
+        query["category"] = category
+    if is_featured is not None:
+        query["is_featured"] = is_featured
+    if validation_status == "validated":
+        # Products written before background validation have no status field
+        query["validation_status"] = {"$in": ["validated", None]}
+    elif validation_status is not None:
+        query["validation_status"] = validation_status
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    if price:
+        query["price"] = price
+    return query
+
+# Sparse fieldsets and response encoding
+# `fields=id,name,price` is passed to Mongo as a projection; without it every
+# Product field is projected. Documents are written by this API, so reads reshape
+# them to the schema (filling defaults for fields added later) instead of building
+# and re-validating a Pydantic model per document, and encode them once with orjson.
+# The encoded body is what the catalog cache stores and what ETags hash.
+PRODUCT_FIELDS = tuple(Product.model_fields)
+PRODUCT_DEFAULTS = {
+    name: field.get_default(call_default_factory=True)
+    for name, field in Product.model_fields.items()
+    if not field.is_required() and name not in ("id", "created_at")
+}
+
+def parse_product_fields(fields: Optional[str]) -> Optional[tuple]:
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = sorted(requested - set(PRODUCT_FIELDS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown product fields: {', '.join(unknown)}")
+    return tuple(field for field in PRODUCT_FIELDS if field in requested or field == "id")
+
+def product_projection(fields: Optional[tuple], sort_spec: Optional[list] = None) -> dict:
+    projection = {field: 1 for field in fields or PRODUCT_FIELDS}
+    # The keyset cursor is built from the sort key, so it is read even if not returned
+    for field, _ in sort_spec or ():
+        projection[field] = 1
+    projection["_id"] = 0
+    return projection
+
+def product_documents(documents: list, fields: Optional[tuple]) -> list:
+    names = fields or PRODUCT_FIELDS
+    return [
+        {name: document[name] if name in document else PRODUCT_DEFAULTS.get(name) for name in names}
+        for document in documents
+    ]
+
+def encode_json(content) -> bytes:
+    with Span("encode"):
+        return orjson.dumps(content)
+
+def json_response(response: Response, body: bytes) -> Response:
+    # Returning a Response skips the route's response_model validation
+    return Response(
+        content=body,
+        status_code=response.status_code or 200,
+        media_type="application/json",
+        headers=dict(response.headers),
+    )
+
+# In-process cache for catalog reads
+# Entries expire after a TTL and the least recently used ones are evicted beyond
+# max_size entries or max_bytes of cached bodies; a page of up to MAX_PAGE_SIZE
+# products can be megabytes, so the byte bound is what limits memory. Every product
+# write calls invalidate(); the generation counter stops a read that raced with a
+# write from storing its (now stale) result.
+def cache_entry_bytes(value) -> int:
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(cache_entry_bytes(item) for item in value)
+    return 0
+
+class CatalogCache:
+    def __init__(self, ttl: float, max_size: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, generation: int):
+        if generation != self.generation or self.ttl <= 0 or self.max_size <= 0:
+            return
+        size = cache_entry_bytes(value)
+        # A single entry this large would evict most of the cache to fit
+        if size > self.max_bytes // 4:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, size)
+        self.bytes += size
+        while len(self._entries) > self.max_size or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key)[2]
+
+    def invalidate(self):
+        self.generation += 1
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "generation": self.generation,
+        }
+
+product_cache = CatalogCache(
+    ttl=float(os.environ.get('PRODUCT_CACHE_TTL', '30')),
+    max_size=int(os.environ.get('PRODUCT_CACHE_MAX_SIZE', '1024')),
+    max_bytes=int(os.environ.get('PRODUCT_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+)
+
+# HTTP caching for catalog reads
+# ETags hash the response content (including the next-page cursor), so every worker
+# produces the same tag for the same data. Product writes invalidate product_cache,
+# which bumps its generation and forces new tags to be computed.
+CATALOG_CACHE_CONTROL = os.environ.get(
+    'CATALOG_CACHE_CONTROL', 'public, max-age=60, stale-while-revalidate=300'
+)
+
+def compute_etag(body: bytes, next_cursor: Optional[str] = None) -> str:
+    digest = hashlib.sha256(body)
+    if next_cursor:
+        digest.update(b"\n" + next_cursor.encode())
+    return '"' + digest.hexdigest()[:32] + '"'
+
+# Single-product ETags lead with the product version, so If-Match can be checked
+# inside the write itself; the content hash still changes with any other change
+def product_etag(document: dict, body: bytes) -> str:
+    return f'"{document.get("version", 1)}-{compute_etag(body)[1:17]}"'
+
+def if_match_version(if_match: Optional[str]) -> Optional[int]:
+    if not if_match or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip().removeprefix("W/").strip('"')
+    try:
+        return int(tag.split("-")[0])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be a product ETag or version")
+
+PRODUCT_VERSION_CONFLICT = "Product was changed by another request; reload it and retry"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+def catalog_response(response: Response, body: bytes, etag: str, if_none_match: Optional[str]):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CATALOG_CACHE_CONTROL
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=dict(response.headers))
+    return json_response(response, body)
+
+async def cached_product_page(
+    key: tuple, query: dict, sort_spec: list, limit: int, cursor: Optional[str], fields: Optional[tuple]
+):
+    key = key + (fields,)
+    page = product_cache.get(key)
+    if page is None:
+        generation = product_cache.generation
+        projection = product_projection(fields, sort_spec)
+        with Span("db"):
+            products, next_cursor = await fetch_product_page(query, sort_spec, limit, cursor, projection)
+        body = encode_json(product_documents(products, fields))
+        page = (body, next_cursor, compute_etag(body, next_cursor))
+        product_cache.set(key, page, generation)
+    return page
+
+# Full-text product search
+# An inverted index over name, description and material details kept in process.
+# Each posting holds a field-weighted term frequency; a query ANDs its terms and
+# ranks matches by tf-idf.
+SEARCH_FIELD_WEIGHTS = {"name": 3.0, "material": 2.0, "gemstones": 2.0, "origin": 2.0, "description": 1.0}
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def normalize_term(term: str) -> str:
+    # Fold simple plurals so "sapphire" matches "Sapphires"
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+def tokenize(text) -> list:
+    return [normalize_term(term) for term in TOKEN_RE.findall(str(text).lower())] if text else []
+
+def product_search_fields(product: dict) -> dict:
+    details = product.get("material_details") or {}
+    return {
+        "name": product.get("name"),
+        "description": product.get("description"),
+        "material": details.get("material"),
+        "gemstones": details.get("gemstones"),
+        "origin": details.get("origin"),
+    }
+
+# A walk down the shortest list that finds fewer than one match in this many ids
+# gives way to a set intersection
+SEARCH_WALK_FACTOR = 4
+
+class ProductSearchIndex:
+    def __init__(self):
+        # term -> {weight: product_ids}, as a set for membership and intersections and
+        # as a sorted list for reading them in id order. Field weights are small
+        # multiples of a few constants, so a term has only a handful of distinct
+        # weights (usually one), and every product at a weight scores the same.
+        self.levels = {}
+        self.ordered = {}
+        self.documents = {}
+        # Change-stream deletes only carry the Mongo _id
+        self.object_ids = {}
+        # (term, weight) lists that have had ids appended by a bulk load
+        self.unsorted = set()
+
+    def clear(self):
+        self.levels.clear()
+        self.ordered.clear()
+        self.documents.clear()
+        self.object_ids.clear()
+        self.unsorted.clear()
+
+    def add(self, product: dict, sort: bool = True):
+        product_id = product["id"]
+        self.remove(product_id)
+        weights = {}
+        for field, text in product_search_fields(product).items():
+            for term in tokenize(text):
+                weights[term] = weights.get(term, 0.0) + SEARCH_FIELD_WEIGHTS[field]
+        for term, weight in weights.items():
+            self.levels.setdefault(term, {}).setdefault(weight, set()).add(product_id)
+            ordered = self.ordered.setdefault(term, {}).setdefault(weight, [])
+            if sort and (term, weight) not in self.unsorted:
+                insort(ordered, product_id)
+            else:
+                ordered.append(product_id)
+                self.unsorted.add((term, weight))
+        object_id = str(product["_id"]) if "_id" in product else None
+        if object_id:
+            self.object_ids[object_id] = product_id
+        self.documents[product_id] = (tuple(weights), object_id)
+
+    def remove(self, product_id: str):
+        terms, object_id = self.documents.pop(product_id, ((), None))
+        self.object_ids.pop(object_id, None)
+        for term in terms:
+            levels = self.levels[term]
+            weight = next(weight for weight, ids in levels.items() if product_id in ids)
+            levels[weight].discard(product_id)
+            ordered = self.ordered[term][weight]
+            if (term, weight) in self.unsorted:
+                ordered.remove(product_id)
+            else:
+                del ordered[bisect_left(ordered, product_id)]
+            if not ordered:
+                del levels[weight]
+                del self.ordered[term][weight]
+                self.unsorted.discard((term, weight))
+            if not levels:
+                del self.levels[term]
+                del self.ordered[term]
+
+    def search(self, query: str, count: int) -> list:
+        # Top `count` product ids by score, ties broken by id. Every product in one
+        # combination of weight levels (one level per term) scores the same, so the
+        # combinations are visited best first and the walk stops once `count` matches
+        # are found and no later combination can score as high. Within a combination
+        # the shortest level is read in id order and checked against the others' sets,
+        # unless matches turn out to be rare, when a C-level set intersection is faster.
+        terms = set(tokenize(query))
+        if not terms or not all(term in self.levels for term in terms):
+            return []
+        total_docs = len(self.documents)
+        lists = []
+        for term in terms:
+            levels = self.levels[term]
+            idf = math.log(1 + total_docs / sum(map(len, levels.values())))
+            lists.append(sorted(
+                ((weight * idf, ids, self.ordered[term][weight]) for weight, ids in levels.items()),
+                key=lambda level: -level[0],
+            ))
+        first = (0,) * len(lists)
+        pending = [(-sum(levels[0][0] for levels in lists), first)]
+        queued = {first}
+        ranked = []
+        found = 0
+        cutoff = None
+        while pending:
+            negative_score, combination = heapq.heappop(pending)
+            if cutoff is not None and -negative_score < cutoff:
+                break
+            chosen = sorted((levels[position] for levels, position in zip(lists, combination)), key=lambda level: len(level[1]))
+            matches = self._first_matches(chosen, count)
+            ranked.extend((negative_score, product_id) for product_id in matches)
+            found += len(matches)
+            if cutoff is None and found >= count:
+                cutoff = -negative_score
+            for index, levels in enumerate(lists):
+                position = combination[index]
+                if position + 1 < len(levels):
+                    following = combination[:index] + (position + 1,) + combination[index + 1:]
+                    if following not in queued:
+                        queued.add(following)
+                        score = negative_score + levels[position][0] - levels[position + 1][0]
+                        heapq.heappush(pending, (score, following))
+        ranked.sort()
+        return [product_id for _, product_id in ranked[:count]]
+
+    @staticmethod
+    def _first_matches(chosen: list, count: int) -> list:
+        # The `count` smallest ids in every chosen level, shortest level first
+        _, shortest, ordered = chosen[0]
+        others = [ids for _, ids, _ in chosen[1:]]
+        if not others:
+            return ordered[:count]
+        matches = []
+        budget = count * SEARCH_WALK_FACTOR
+        for scanned, product_id in enumerate(ordered):
+            if all(product_id in ids for ids in others):
+                matches.append(product_id)
+                if len(matches) == count:
+                    return matches
+            elif scanned >= budget:
+                return sorted(shortest.intersection(*others))[:count]
+        return matches
+
+    def finish_bulk_load(self):
+        for term, weight in self.unsorted:
+            self.ordered[term][weight].sort()
+        self.unsorted.clear()
+
+search_index = ProductSearchIndex()
+
+# Typeahead suggestions
+# A burst trie over product names, categories and material details. Each distinct
+# phrase is stored once with its weight (the number of products using it, with
+# featured products counting extra), and is keyed from the start of each of its
+# words, capped at SUGGEST_MAX_KEY characters. Keys are kept in leaf buckets of up
+# to SUGGEST_BUCKET_SIZE entries, which split into child nodes by the next
+# character when they overflow, so unique name tails do not cost a node per
+# character. Every node caches its best suggestions; a keystroke is a walk down
+# the trie and at most a scan of one bucket.
+SUGGEST_TOP_K = 10
+SUGGEST_MAX_KEY = 32
+SUGGEST_BUCKET_SIZE = 64
+SUGGEST_FEATURED_WEIGHT = 3
+
+def normalize_phrase(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+def product_suggestion_phrases(product: dict) -> set:
+    details = product.get("material_details") or {}
+    phrases = {("product", product.get("name")), ("category", product.get("category"))}
+    for field in ("material", "gemstones", "origin"):
+        phrases.add(("material", details.get(field)))
+    return {
+        (kind, str(text).strip()) for kind, text in phrases
+        if text and normalize_phrase(text) not in ("", "none")
+    }
+
+class SuggestionPhrase:
+    __slots__ = ("kind", "text", "normalized", "weight")
+
+    def __init__(self, kind: str, text: str):
+        self.kind = kind
+        self.text = text
+        self.normalized = normalize_phrase(text)
+        self.weight = 0
+
+    def starts(self):
+        # A key starts at each word
+        yield 0
+        for position, char in enumerate(self.normalized):
+            if char == " ":
+                yield position + 1
+
+class TrieNode:
+    __slots__ = ("children", "entries", "top")
+
+    def __init__(self):
+        # children is None while the node is a bucket; entries are (phrase, start)
+        # pairs, all keys below a bucket or the keys ending at an inner node
+        self.children = None
+        self.entries = []
+        self.top = ()
+
+def key_length(entry) -> int:
+    phrase, start = entry
+    return min(len(phrase.normalized) - start, SUGGEST_MAX_KEY)
+
+class SuggestionTrie:
+    def __init__(self):
+        self.root = TrieNode()
+        self.phrases = {}
+        self.products = {}
+
+    def clear(self):
+        self.root = TrieNode()
+        self.phrases.clear()
+        self.products.clear()
+
+    def add(self, product: dict, update: bool = True):
+        weight = SUGGEST_FEATURED_WEIGHT if product.get("is_featured") else 1
+        deltas = self._release(product["id"])
+        phrases = []
+        for kind, text in product_suggestion_phrases(product):
+            phrase = self.phrases.get((kind, text))
+            if phrase is None:
+                phrase = self.phrases[kind, text] = SuggestionPhrase(kind, text)
+            phrases.append(phrase)
+            deltas[phrase] = deltas.get(phrase, 0) + weight
+        self.products[product["id"]] = (tuple(phrases), weight)
+        self._apply(deltas, update)
+
+    def remove(self, product_id: str, update: bool = True):
+        self._apply(self._release(product_id), update)
+
+    def _release(self, product_id: str) -> dict:
+        phrases, weight = self.products.pop(product_id, ((), 0))
+        return {phrase: -weight for phrase in phrases}
+
+    def _apply(self, deltas: dict, update: bool):
+        # Only phrases gaining or losing their last product change the trie's shape;
+        # the others just need the cached suggestions on their paths recomputed
+        touched = {}
+        for phrase, delta in deltas.items():
+            if not delta:
+                continue
+            previous = phrase.weight
+            phrase.weight += delta
+            if phrase.weight <= 0:
+                del self.phrases[phrase.kind, phrase.text]
+                for start in phrase.starts():
+                    for node, depth in self._delete((phrase, start)):
+                        touched[id(node)] = (depth, node)
+            elif not previous:
+                for start in phrase.starts():
+                    self._insert((phrase, start), update)
+        if not update:
+            # finish_bulk_load() recomputes every cached top list
+            return
+        for phrase in deltas:
+            if phrase.weight > 0:
+                for start in phrase.starts():
+                    for node, depth in self._path((phrase, start)):
+                        touched[id(node)] = (depth, node)
+        for depth, node in sorted(touched.values(), key=lambda item: -item[0]):
+            self._compute_top(node)
+
+    def _path(self, entry) -> list:
+        # Nodes from the root down to the one holding the entry
+        phrase, start = entry
+        length = key_length(entry)
+        node, depth = self.root, 0
+        path = [(node, depth)]
+        while node.children is not None and depth < length:
+            char = phrase.normalized[start + depth]
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = TrieNode()
+            node, depth = child, depth + 1
+            path.append((node, depth))
+        return path
+
+    def _insert(self, entry, update: bool):
+        node, depth = self._path(entry)[-1]
+        node.entries.append(entry)
+        if node.children is None and len(node.entries) > SUGGEST_BUCKET_SIZE and depth < SUGGEST_MAX_KEY:
+            self._burst(node, depth, update)
+
+    def _burst(self, node: TrieNode, depth: int, update: bool):
+        node.children = {}
+        entries, node.entries = node.entries, []
+        for entry in entries:
+            if key_length(entry) == depth:
+                node.entries.append(entry)
+                continue
+            phrase, start = entry
+            char = phrase.normalized[start + depth]
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = TrieNode()
+            child.entries.append(entry)
+        for child in node.children.values():
+            if len(child.entries) > SUGGEST_BUCKET_SIZE and depth + 1 < SUGGEST_MAX_KEY:
+                self._burst(child, depth + 1, update)
+            if update:
+                self._compute_top(child)
+
+    def _delete(self, entry) -> list:
+        path = self._path(entry)
+        path[-1][0].entries.remove(entry)
+        # Turn inner nodes left without children back into buckets and prune empty ones
+        phrase, start = entry
+        for index in range(len(path) - 1, -1, -1):
+            node, depth = path[index]
+            if node.children is not None and not node.children:
+                node.children = None
+            if not index or node.children is not None or node.entries:
+                break
+            del path[index - 1][0].children[phrase.normalized[start + depth - 1]]
+        return path
+
+    def _compute_top(self, node: TrieNode):
+        candidates = {(-phrase.weight, phrase.text, phrase.kind) for phrase, _ in node.entries}
+        for child in (node.children or {}).values():
+            candidates.update(child.top)
+        node.top = tuple(sorted(candidates)[:SUGGEST_TOP_K])
+
+    def finish_bulk_load(self):
+        # Products added with update=False leave every cached top list stale
+        stack = [(self.root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done:
+                self._compute_top(node)
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in (node.children or {}).values())
+
+    def suggest(self, prefix: str, limit: int) -> list:
+        key = normalize_phrase(prefix)[:SUGGEST_MAX_KEY]
+        node = self.root
+        for depth, char in enumerate(key):
+            if node.children is None:
+                # The rest of the key is matched within the bucket
+                candidates = {
+                    (-phrase.weight, phrase.text, phrase.kind) for phrase, start in node.entries
+                    if phrase.normalized.startswith(key, start)
+                }
+                return sorted(candidates)[:limit]
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.top[:limit]
+
+suggest_index = SuggestionTrie()
+
+# Local product state (cache, search index) is updated through these hooks, both
+# by this worker's write endpoints and by the change-stream watcher
+PRODUCT_INDEX_PROJECTION = {
+    "id": 1, "name": 1, "description": 1, "category": 1, "material_details": 1, "is_featured": 1,
+    "image_url": 1, "model_image_url": 1,
+}
+
+def on_product_written(product: dict):
+    product_cache.invalidate()
+    search_index.add(product)
+    suggest_index.add(product)
+    schedule_image_indexing([product])
+
+# Large batches defer index maintenance to one sort/recompute pass at the end
+BULK_REINDEX_THRESHOLD = 200
+
+def on_products_written(products: list):
+    if len(products) <= BULK_REINDEX_THRESHOLD:
+        for product in products:
+            on_product_written(product)
+        return
+    product_cache.invalidate()
+    for product in products:
+        search_index.add(product, sort=False)
+        suggest_index.add(product, update=False)
+    search_index.finish_bulk_load()
+    suggest_index.finish_bulk_load()
+    schedule_image_indexing(products)
+
+def on_product_deleted(product_id: str):
+    product_cache.invalidate()
+    search_index.remove(product_id)
+    suggest_index.remove(product_id)
+    duplicate_index.remove(product_id)
+
+async def rebuild_product_state():
+    product_cache.invalidate()
+    search_index.clear()
+    suggest_index.clear()
+    duplicate_index.clear()
+    async for product in db.products.find({}, PRODUCT_INDEX_PROJECTION):
+        search_index.add(product, sort=False)
+        suggest_index.add(product, update=False)
+        duplicate_index.set_urls(product)
+    search_index.finish_bulk_load()
+    suggest_index.finish_bulk_load()
+    await index_product_images(list(duplicate_index.urls))
+    logger.info(
+        f"Search and suggestion indexes built for {len(search_index.documents)} products, "
+        f"{len(duplicate_index.hashes)} image hashes indexed"
+    )
+    schedule_image_backfill()
+
 # Product Routes
 @api_router.get("/products", response_model=List[Product])
-async def get_products():
+async def get_products(
+    response: Response,
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    is_featured: Optional[bool] = None,
+    validation_status: Optional[ValidationStatus] = None,
+    sort: str = "created_at",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available")
-    products = await db.products.find().to_list(1000)
-    return [Product(**product) for product in products]
+    selected = parse_product_fields(fields)
+    sort_spec = product_sort_spec(sort)
+    query = build_product_query(category, min_price, max_price, is_featured, validation_status)
+    key = ("products", category, min_price, max_price, is_featured, validation_status, sort, limit, cursor)
+    body, next_cursor, etag = await cached_product_page(key, query, sort_spec, limit, cursor, selected)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return catalog_response(response, body, etag, if_none_match)
 
 @api_router.get("/products/featured", response_model=List[Product])
-async def get_featured_products():
+async def get_featured_products(
+    response: Response,
+    validation_status: Optional[ValidationStatus] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available")
-    products = await db.products.find({"is_featured": True}).to_list(1000)
-    return [Product(**product) for product in products]
+    selected = parse_product_fields(fields)
+    query = build_product_query(is_featured=True, validation_status=validation_status)
+    key = ("featured", validation_status, limit, cursor)
+    body, next_cursor, etag = await cached_product_page(key, query, PRODUCT_SORT, limit, cursor, selected)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return catalog_response(response, body, etag, if_none_match)
+
+@api_router.get("/products/search", response_model=List[Product])
+async def search_products(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    fields: Optional[str] = None,
+):
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    selected = parse_product_fields(fields)
+    # Rank one extra result to know whether another page exists
+    with Span("search"):
+        product_ids = search_index.search(q, offset + limit + 1)[offset:]
+    if len(product_ids) > limit:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+        product_ids = product_ids[:limit]
+    if not product_ids:
+        return json_response(response, b"[]")
+    query = {"id": {"$in": product_ids}}
+    with Span("db"):
+        products = await db.products.find(query, product_projection(selected)).to_list(len(product_ids))
+    by_id = {product["id"]: product for product in products}
+    ranked = [by_id[product_id] for product_id in product_ids if product_id in by_id]
+    return json_response(response, encode_json(product_documents(ranked, selected)))
+
+# Served entirely from memory so per-keystroke traffic never reaches MongoDB
+@api_router.get("/products/suggest", response_model=List[Suggestion])
+async def suggest_products(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(SUGGEST_TOP_K, ge=1, le=SUGGEST_TOP_K),
+):
+    return [Suggestion(text=text, kind=kind) for _, text, kind in suggest_index.suggest(q, limit)]
+
+@api_router.get("/products/categories", response_model=List[str])
+async def get_product_categories():
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    cached = product_cache.get(("categories",))
+    if cached is not None:
+        return cached
+    generation = product_cache.generation
+    categories = sorted(await db.products.distinct("category"))
+    product_cache.set(("categories",), categories, generation)
+    return categories
 
 @api_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
+async def get_product(
+    response: Response,
+    product_id: str,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available")
-    product = await db.products.find_one({"id": product_id})
-    if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return Product(**product)
+    selected = parse_product_fields(fields)
+    key = ("product", product_id, selected)
+    cached = product_cache.get(key)
+    if cached is None:
+        generation = product_cache.generation
+        projection = product_projection(selected)
+        projection["version"] = 1
+        with Span("db"):
+            product = await db.products.find_one({"id": product_id}, projection)
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        body = encode_json(product_documents([product], selected)[0])
+        cached = (body, product_etag(product, body))
+        product_cache.set(key, cached, generation)
+    body, etag = cached
+    return catalog_response(response, body, etag, if_none_match)
 
 @api_router.post("/products", response_model=Product)
-async def create_product(product: ProductCreate):
+async def create_product(product: ProductCreate, response: Response):
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available")
     
+    with Span("model"):
+        product_dict = product.dict()
+        product_obj = Product(**product_dict)
+    
+    if IMAGE_VALIDATION_ASYNC:
+        # Accept now; the background workers validate the images
+        product_obj.validation_status = "pending"
+        product_doc = product_obj.dict()
+        with Span("db"):
+            await db.products.insert_one(product_doc)
+            await validation_workers.enqueue(product_obj.id, product.image_url, product.model_image_url)
+        on_product_written(product_doc)
+        response.status_code = 202
+        return product_obj
+    
     # Validate that model image matches product image
-    if not await validate_model_image(product.image_url, product.model_image_url):
-        raise HTTPException(
-            status_code=400, 
-            detail="The model image must show the same jewelry as the product image. Please ensure consistency."
-        )
+    with Span("validate"):
+        validation = await validate_model_image(product.image_url, product.model_image_url)
+    if not validation.matches:
+        raise HTTPException(status_code=400, detail=image_mismatch_detail(validation))
+    product_obj.validation_detail = validation.detail
     
-    product_dict = product.dict()
-    product_obj = Product(**product_dict)
-    await db.products.insert_one(product_obj.dict())
+    # Flag images already used by other products
+    if DUPLICATE_IMAGE_POLICY != "off":
+        with Span("duplicates"):
+            duplicates = await duplicate_images(product.image_url, product.model_image_url)
+        duplicate_ids = list(dict.fromkeys(match.product_id for match in duplicates))
+        if duplicate_ids and DUPLICATE_IMAGE_POLICY == "reject":
+            raise HTTPException(status_code=409, detail=duplicate_images_detail(duplicate_ids))
+        if duplicate_ids:
+            response.headers["X-Duplicate-Of"] = ",".join(duplicate_ids)
+    
+    product_doc = product_obj.dict()
+    with Span("db"):
+        await db.products.insert_one(product_doc)
+    on_product_written(product_doc)
     return product_obj
 
+MODEL_IMAGE_MISMATCH = "The model image must show the same jewelry as the product image. Please ensure consistency."
+
+# Pick the image pair an update has to validate, or None if no image changes
+def model_image_pair(update_data: dict, existing_product: dict):
+    if 'image_url' not in update_data and 'model_image_url' not in update_data:
+        return None
+    return (
+        update_data.get('image_url', existing_product['image_url']),
+        update_data.get('model_image_url', existing_product['model_image_url']),
+    )
+
+# Image pair validation
+# Both images are downloaded concurrently through a shared pooled client with a
+# timeout and a size cap, then fingerprinted off the event loop. A fingerprint is a
+# 64-bit DCT perceptual hash (overall shape) plus a coarse RGB histogram (metal and
+# stone colours); the pair's similarity blends the two. This only recognises near-
+# identical photos: a model shot of the same piece usually scores close to 0, so the
+# score is only enforced in "strict" mode, where pairs below IMAGE_MATCH_THRESHOLD and
+# unreachable images fail. "lenient" records the score in validation_detail and lets
+# unreachable images pass with a warning; "off" checks the URLs only. Both download
+# modes hold the write until the images arrive, so they are opt-in (see also
+# IMAGE_VALIDATION_ASYNC, which moves validation off the request path).
+IMAGE_VALIDATION_MODE = os.environ.get('IMAGE_VALIDATION_MODE', 'off')
+IMAGE_FETCH_TIMEOUT = float(os.environ.get('IMAGE_FETCH_TIMEOUT', '10'))
+IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', str(15 * 1024 * 1024)))
+IMAGE_MATCH_THRESHOLD = float(os.environ.get('IMAGE_MATCH_THRESHOLD', '0.5'))
+# Image URLs come from unauthenticated writes and are fetched again by the health
+# crawler and the resizing proxy, so every request, including each redirect hop, must
+# resolve to a public address unless its host is listed here
+IMAGE_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.environ.get('IMAGE_ALLOWED_HOSTS', '').split(',') if host.strip()
+}
+IMAGE_MAX_REDIRECTS = 5
+PHASH_WEIGHT = 0.5
+HASH_SIZE = 8
+HASH_SAMPLE = 32
+HISTOGRAM_BINS = 4
+
+http_client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(IMAGE_FETCH_TIMEOUT),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            # Redirects are followed by open_image, which checks every hop
+            follow_redirects=False,
+        )
+    return http_client
+
+class ImageFetchError(Exception):
+    pass
+
+# Returns the vetted address to connect to, or None for hosts in IMAGE_ALLOWED_HOSTS
+async def check_image_host(url: str) -> Optional[str]:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ImageFetchError(f"Unsupported image URL: {url}")
+    host = parts.hostname.lower()
+    if host in IMAGE_ALLOWED_HOSTS:
+        return None
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError) as e:
+        raise ImageFetchError(f"Could not resolve {host}: {e}") from e
+    checked = []
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ImageFetchError(f"{url} resolves to a non-public address")
+        checked.append(str(address))
+    if not checked:
+        raise ImageFetchError(f"Could not resolve {host}")
+    return checked[0]
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+# Streams the response for url, following redirects itself so that every hop is
+# checked by check_image_host. Requests go to the address that was checked, with the
+# original name kept for the Host header and TLS, so the name is never resolved again
+# (a second lookup could return a different, private address).
+@asynccontextmanager
+async def open_image(method: str, url: str, headers: Optional[dict] = None):
+    client = get_http_client()
+    for _ in range(IMAGE_MAX_REDIRECTS + 1):
+        address = await check_image_host(url)
+        request = client.build_request(method, url, headers=headers)
+        if address is not None:
+            request.extensions["sni_hostname"] = request.url.host
+            request.url = request.url.copy_with(host=address)
+        response = await client.send(request, stream=True)
+        try:
+            if response.status_code not in REDIRECT_STATUSES:
+                yield response
+                return
+            location = response.headers.get("location")
+            if not location:
+                raise ImageFetchError(f"{url} returned HTTP {response.status_code} without a Location")
+            url = str(httpx.URL(url).join(location))
+        finally:
+            await response.aclose()
+    raise ImageFetchError(f"{url} redirected more than {IMAGE_MAX_REDIRECTS} times")
+
+class ImageFingerprint(NamedTuple):
+    phash: int
+    histogram: np.ndarray
+
+class ImageValidation(BaseModel):
+    matches: bool
+    similarity: Optional[float] = None
+    detail: Optional[str] = None
+    # Set when an image could not be fetched, which may succeed on a later attempt
+    retryable: bool = False
+
+# Returns the body and response headers; the body is None when a conditional
+# request is answered with 304 Not Modified
+async def fetch_image(url: str, headers: Optional[dict] = None):
+    try:
+        async with open_image("GET", url, headers) as response:
+            if response.status_code == 304 and headers:
+                return None, response.headers
+            if response.status_code != 200:
+                raise ImageFetchError(f"{url} returned HTTP {response.status_code}")
+            if int(response.headers.get("content-length") or 0) > IMAGE_MAX_BYTES:
+                raise ImageFetchError(f"{url} is larger than {IMAGE_MAX_BYTES} bytes")
+            data = bytearray()
+            async for chunk in response.aiter_bytes():
+                data += chunk
+                if len(data) > IMAGE_MAX_BYTES:
+                    raise ImageFetchError(f"{url} is larger than {IMAGE_MAX_BYTES} bytes")
+            return bytes(data), response.headers
+    except httpx.HTTPError as e:
+        raise ImageFetchError(f"Could not fetch {url}: {e}") from e
+
+# Orthonormal DCT-II basis, so the 2-D transform is two matrix products
+_n = np.arange(HASH_SAMPLE)
+DCT_MATRIX = np.sqrt(2 / HASH_SAMPLE) * np.cos(np.pi * (2 * _n[None, :] + 1) * _n[:, None] / (2 * HASH_SAMPLE))
+DCT_MATRIX[0] /= np.sqrt(2)
+
+def image_fingerprint(data: bytes) -> ImageFingerprint:
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # Let the JPEG decoder downscale while decoding; we only need thumbnails
+            image.draft("RGB", (HASH_SAMPLE * 4, HASH_SAMPLE * 4))
+            image = image.convert("RGB")
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ImageFetchError("not a readable image") from e
+    gray = np.asarray(image.convert("L").resize((HASH_SAMPLE, HASH_SAMPLE), Image.LANCZOS), dtype=np.float64)
+    low = (DCT_MATRIX @ gray @ DCT_MATRIX.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    bits = low > np.median(low[1:])
+    phash = int("".join("1" if bit else "0" for bit in bits), 2)
+    pixels = np.asarray(image.resize((64, 64)), dtype=np.uint8).reshape(-1, 3) // (256 // HISTOGRAM_BINS)
+    codes = (pixels[:, 0].astype(np.int64) * HISTOGRAM_BINS + pixels[:, 1]) * HISTOGRAM_BINS + pixels[:, 2]
+    histogram = np.bincount(codes, minlength=HISTOGRAM_BINS ** 3) / len(codes)
+    return ImageFingerprint(phash, histogram)
+
+def image_similarity(a: ImageFingerprint, b: ImageFingerprint) -> float:
+    # Unrelated images differ in about half their hash bits, so that maps to 0
+    distance = bin(a.phash ^ b.phash).count("1")
+    hash_similarity = max(0.0, 1 - 2 * distance / (HASH_SIZE * HASH_SIZE))
+    histogram_similarity = float(np.minimum(a.histogram, b.histogram).sum())
+    return PHASH_WEIGHT * hash_similarity + (1 - PHASH_WEIGHT) * histogram_similarity
+
+# Image fingerprint store
+# Fingerprints are kept in an in-memory LRU backed by the image_fingerprints
+# collection, keyed by URL. An entry younger than IMAGE_FINGERPRINT_MAX_AGE is used
+# as is; an older one is revalidated with If-None-Match / If-Modified-Since. A fresh
+# download whose content digest is already known reuses that fingerprint instead of
+# decoding and hashing again. Concurrent requests for one URL share a single fetch.
+IMAGE_FINGERPRINT_MAX_AGE = float(os.environ.get('IMAGE_FINGERPRINT_MAX_AGE', str(24 * 3600)))
+IMAGE_FINGERPRINT_CACHE_SIZE = int(os.environ.get('IMAGE_FINGERPRINT_CACHE_SIZE', '10000'))
+
+def fingerprint_to_doc(fingerprint: ImageFingerprint) -> dict:
+    # Mongo integers are signed 64-bit, so the hash is stored as hex
+    return {"phash": f"{fingerprint.phash:016x}", "histogram": fingerprint.histogram.tolist()}
+
+def fingerprint_from_doc(doc: dict) -> ImageFingerprint:
+    return ImageFingerprint(int(doc["phash"], 16), np.asarray(doc["histogram"]))
+
+class FingerprintStore:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.by_url = OrderedDict()
+        self.by_digest = OrderedDict()
+        self.inflight = {}
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+
+    def _remember(self, table: OrderedDict, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.max_size:
+            table.popitem(last=False)
+
+    async def _load(self, url: str) -> Optional[dict]:
+        entry = self.by_url.get(url)
+        if entry is not None:
+            self.by_url.move_to_end(url)
+        elif db is not None:
+            entry = await db.image_fingerprints.find_one({"url": url}, {"_id": 0})
+            if entry is not None:
+                self._remember(self.by_url, url, entry)
+        return entry
+
+    async def _save(self, entry: dict):
+        self._remember(self.by_url, entry["url"], entry)
+        if db is not None:
+            await db.image_fingerprints.update_one({"url": entry["url"]}, {"$set": entry}, upsert=True)
+
+    async def _by_digest(self, digest: str) -> Optional[ImageFingerprint]:
+        fingerprint = self.by_digest.get(digest)
+        if fingerprint is None and db is not None:
+            doc = await db.image_fingerprints.find_one({"digest": digest}, {"_id": 0, "phash": 1, "histogram": 1})
+            if doc is not None:
+                fingerprint = fingerprint_from_doc(doc)
+        return fingerprint
+
+    async def get(self, url: str) -> ImageFingerprint:
+        pending = self.inflight.get(url)
+        if pending is None:
+            pending = self.inflight[url] = asyncio.ensure_future(self._get(url))
+            pending.add_done_callback(lambda _: self.inflight.pop(url, None))
+        return await asyncio.shield(pending)
+
+    async def _get(self, url: str) -> ImageFingerprint:
+        entry = await self._load(url)
+        now = time.time()
+        if entry is not None and now - entry["checked_at"] < IMAGE_FINGERPRINT_MAX_AGE:
+            self.hits += 1
+            return fingerprint_from_doc(entry)
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        data, response_headers = await fetch_image(url, headers)
+        if data is None:
+            # A 304 may carry newer validators for the same content
+            self.revalidated += 1
+            entry["checked_at"] = now
+            entry["etag"] = response_headers.get("etag", entry.get("etag"))
+            entry["last_modified"] = response_headers.get("last-modified", entry.get("last_modified"))
+            await self._save(entry)
+            return fingerprint_from_doc(entry)
+        self.downloads += 1
+        digest = hashlib.sha256(data).hexdigest()
+        fingerprint = await self._by_digest(digest)
+        if fingerprint is None:
+            try:
+                fingerprint = await asyncio.to_thread(image_fingerprint, data)
+            except ImageFetchError as e:
+                raise ImageFetchError(f"{url} is {e}") from e
+        self._remember(self.by_digest, digest, fingerprint)
+        await self._save({
+            "url": url,
+            "digest": digest,
+            "etag": response_headers.get("etag"),
+            "last_modified": response_headers.get("last-modified"),
+            "checked_at": now,
+            **fingerprint_to_doc(fingerprint),
+        })
+        return fingerprint
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.by_url),
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "downloads": self.downloads,
+        }
+
+fingerprint_store = FingerprintStore(IMAGE_FINGERPRINT_CACHE_SIZE)
+
+async def fingerprint_url(url: str) -> ImageFingerprint:
+    return await fingerprint_store.get(url)
+
+# Near-duplicate image index
+# Every product's image_url and model_image_url hash is indexed by multi-index
+# hashing: the 64-bit hash is split into DUPLICATE_MAX_DISTANCE // 2 + 1 chunks, and
+# any two hashes within DUPLICATE_MAX_DISTANCE differ in at most one bit of some
+# chunk, so a lookup probes each chunk's bucket and its one-bit neighbours and only
+# verifies the hashes found there. Hashes come from the fingerprint store; images
+# that were never fingerprinted (sample data, seeded catalogs, writes made with
+# validation off) are fingerprinted in the background once the index is built.
+# DUPLICATE_IMAGE_POLICY is "warn" (creates report X-Duplicate-Of), "reject" (409)
+# or "off". Checking a new product downloads its images, so like image validation it
+# is opt-in, and it runs whatever IMAGE_VALIDATION_MODE is.
+DUPLICATE_MAX_DISTANCE = int(os.environ.get('DUPLICATE_MAX_DISTANCE', '4'))
+DUPLICATE_IMAGE_POLICY = os.environ.get('DUPLICATE_IMAGE_POLICY', 'off')
+# Concurrent downloads for the background fingerprint backfill; 0 disables it. With
+# image validation and the duplicate check both off nothing needs the hashes, so the
+# backfill does not run either.
+IMAGE_BACKFILL_CONCURRENCY = int(os.environ.get('IMAGE_BACKFILL_CONCURRENCY', '8'))
+PRODUCT_IMAGE_KINDS = ("image_url", "model_image_url")
+
+class DuplicateMatch(NamedTuple):
+    product_id: str
+    kind: str
+    url: str
+    distance: int
+
+class ImageDuplicateIndex:
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        bits = HASH_SIZE * HASH_SIZE
+        count = max_distance // 2 + 1
+        self.chunk_distance = max_distance // count
+        bounds = [bits * i // count for i in range(count + 1)]
+        self.chunks = [(start, end - start) for start, end in zip(bounds, bounds[1:])]
+        self.clusters_cache = {}
+        self.clear()
+
+    def clear(self):
+        # Tables map chunk values to distinct hashes, hashes map to their images
+        self.tables = [{} for _ in self.chunks]
+        self.images = {}
+        self.hashes = {}
+        self.urls = {}
+        self.clusters_cache.clear()
+
+    def _chunks(self, phash: int):
+        for table, (shift, width) in zip(self.tables, self.chunks):
+            yield table, (phash >> shift) & ((1 << width) - 1), width
+
+    def set_urls(self, product: dict):
+        # Forget the product's old hashes; they are filled in once looked up
+        self.remove(product["id"])
+        for kind in PRODUCT_IMAGE_KINDS:
+            if product.get(kind):
+                self.urls[(product["id"], kind)] = product[kind]
+
+    def add(self, product_id: str, kind: str, phash: int):
+        key = (product_id, kind)
+        if key not in self.urls or key in self.hashes:
+            return
+        self.hashes[key] = phash
+        keys = self.images.get(phash)
+        if keys is None:
+            keys = self.images[phash] = set()
+            for table, chunk, _ in self._chunks(phash):
+                table.setdefault(chunk, set()).add(phash)
+        keys.add(key)
+        self.clusters_cache.clear()
+
+    def remove(self, product_id: str):
+        for kind in PRODUCT_IMAGE_KINDS:
+            key = (product_id, kind)
+            self.urls.pop(key, None)
+            phash = self.hashes.pop(key, None)
+            if phash is None:
+                continue
+            self.clusters_cache.clear()
+            keys = self.images[phash]
+            keys.discard(key)
+            if keys:
+                continue
+            del self.images[phash]
+            for table, chunk, _ in self._chunks(phash):
+                bucket = table[chunk]
+                bucket.discard(phash)
+                if not bucket:
+                    del table[chunk]
+
+    def near_hashes(self, phash: int, max_distance: int) -> List[tuple]:
+        seen, found = set(), []
+        for table, chunk, width in self._chunks(phash):
+            probes = [chunk]
+            if self.chunk_distance:
+                probes.extend(chunk ^ (1 << bit) for bit in range(width))
+            for probe in probes:
+                for other in table.get(probe, ()):
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    distance = bin(phash ^ other).count("1")
+                    if distance <= max_distance:
+                        found.append((distance, other))
+        return found
+
+    def limit(self, max_distance: Optional[int]) -> int:
+        return self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+
+    def near(self, phash: int, max_distance: Optional[int] = None) -> List[DuplicateMatch]:
+        matches = [
+            DuplicateMatch(product_id, kind, self.urls[(product_id, kind)], distance)
+            for distance, other in self.near_hashes(phash, self.limit(max_distance))
+            for product_id, kind in self.images[other]
+        ]
+        matches.sort(key=lambda match: (match.distance, match.product_id, match.kind))
+        return matches
+
+    def clusters(self, max_distance: Optional[int] = None) -> List[List[tuple]]:
+        # Union-find over distinct hashes; kept until the index next changes
+        limit = self.limit(max_distance)
+        if limit in self.clusters_cache:
+            return self.clusters_cache[limit]
+        parent = {phash: phash for phash in self.images}
+
+        def find(phash):
+            while parent[phash] != phash:
+                parent[phash] = parent[parent[phash]]
+                phash = parent[phash]
+            return phash
+
+        def union(a, b):
+            a, b = find(a), find(b)
+            if a != b:
+                parent[a] = b
+
+        # Each pair of buckets at most one bit apart is compared once
+        for table, (_, width) in zip(self.tables, self.chunks):
+            for chunk, bucket in table.items():
+                members = list(bucket)
+                for i, phash in enumerate(members):
+                    for other in members[i + 1:]:
+                        if bin(phash ^ other).count("1") <= limit:
+                            union(phash, other)
+                if not self.chunk_distance:
+                    continue
+                for bit in range(width):
+                    if chunk >> bit & 1:
+                        continue
+                    neighbour = table.get(chunk | 1 << bit)
+                    if neighbour is None:
+                        continue
+                    for phash in members:
+                        for other in neighbour:
+                            if bin(phash ^ other).count("1") <= limit:
+                                union(phash, other)
+        groups = {}
+        for phash, keys in self.images.items():
+            groups.setdefault(find(phash), []).extend(keys)
+        # Only images shared between different products are duplicates
+        clusters = [sorted(keys) for keys in groups.values() if len({key[0] for key in keys}) > 1]
+        clusters.sort(key=lambda keys: (-len(keys), keys[0]))
+        self.clusters_cache[limit] = clusters
+        return clusters
+
+    def stats(self) -> dict:
+        return {"images": len(self.hashes), "pending": len(self.urls) - len(self.hashes)}
+
+duplicate_index = ImageDuplicateIndex(DUPLICATE_MAX_DISTANCE)
+
+async def index_product_images(keys: list):
+    # Hashes come from the fingerprint store's memory, then one query for the rest
+    missing = {}
+    for key in keys:
+        url = duplicate_index.urls.get(key)
+        if url is None:
+            continue
+        entry = fingerprint_store.by_url.get(url)
+        if entry is not None:
+            duplicate_index.add(*key, int(entry["phash"], 16))
+        else:
+            missing.setdefault(url, []).append(key)
+    if not missing or db is None:
+        return
+    urls = list(missing)
+    for start in range(0, len(urls), BULK_CHUNK_SIZE):
+        cursor = db.image_fingerprints.find(
+            {"url": {"$in": urls[start:start + BULK_CHUNK_SIZE]}}, {"_id": 0, "url": 1, "phash": 1}
+        )
+        async for entry in cursor:
+            for key in missing[entry["url"]]:
+                # Skip products whose image changed while this was looked up
+                if duplicate_index.urls.get(key) == entry["url"]:
+                    duplicate_index.add(*key, int(entry["phash"], 16))
+
+def schedule_image_indexing(products: list):
+    if not products:
+        return
+    keys = []
+    for product in products:
+        duplicate_index.set_urls(product)
+        keys.extend((product["id"], kind) for kind in PRODUCT_IMAGE_KINDS)
+    task = asyncio.ensure_future(index_product_images(keys))
+    task.add_done_callback(log_image_indexing_failure)
+
+async def backfill_image_fingerprints():
+    # Each process works through the missing images in its own random order, so
+    # processes starting together mostly fetch different images and find the others'
+    # results in image_fingerprints
+    missing = {}
+    for key, url in duplicate_index.urls.items():
+        if key not in duplicate_index.hashes:
+            missing.setdefault(url, []).append(key)
+    urls = list(missing)
+    random.shuffle(urls)
+    queue = iter(urls)
+    failed = 0
+
+    async def worker():
+        nonlocal failed
+        for url in queue:
+            try:
+                fingerprint = await fingerprint_url(url)
+            except ImageFetchError:
+                failed += 1
+                continue
+            for key in missing[url]:
+                # Skip products whose image changed while this was fetched
+                if duplicate_index.urls.get(key) == url:
+                    duplicate_index.add(*key, fingerprint.phash)
+
+    await asyncio.gather(*(worker() for _ in range(IMAGE_BACKFILL_CONCURRENCY)))
+    if urls:
+        logger.info(f"Fingerprinted {len(urls) - failed} of {len(urls)} unindexed images ({failed} unreachable)")
+
+image_backfill_task = None
+
+def schedule_image_backfill():
+    global image_backfill_task
+    if IMAGE_BACKFILL_CONCURRENCY <= 0:
+        return
+    if IMAGE_VALIDATION_MODE == "off" and DUPLICATE_IMAGE_POLICY == "off":
+        return
+    if image_backfill_task is not None:
+        image_backfill_task.cancel()
+    image_backfill_task = asyncio.ensure_future(backfill_image_fingerprints())
+    image_backfill_task.add_done_callback(log_image_indexing_failure)
+
+def log_image_indexing_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logging.warning(f"Indexing product image hashes failed: {task.exception()}")
+
+async def duplicate_images(product_image_url: str, model_image_url: str) -> List[DuplicateMatch]:
+    # Catalog images near either of the new product's images, using the fingerprints
+    # validation just computed; images that cannot be fingerprinted are not checked
+    matches = {}
+    for url in (product_image_url, model_image_url):
+        try:
+            fingerprint = await fingerprint_url(url)
+        except ImageFetchError:
+            continue
+        for match in duplicate_index.near(fingerprint.phash):
+            key = (match.product_id, match.kind)
+            if key not in matches or match.distance < matches[key].distance:
+                matches[key] = match
+    return sorted(matches.values(), key=lambda match: (match.distance, match.product_id, match.kind))
+
 # Helper function to validate model images
-async def validate_model_image(product_image_url: str, model_image_url: str) -> bool:
+async def validate_model_image(product_image_url: str, model_image_url: str) -> ImageValidation:
     # Basic validation to ensure both URLs are provided
     if not (product_image_url and model_image_url):
-        return False
-        
-    # TODO: Implement AI-based image recognition for jewelry matching
-    # In a production environment, this function would:
-    # 1. Download both images
-    # 2. Use computer vision AI to detect jewelry items in both images
-    # 3. Compare features of the jewelry to ensure they match
-    # 4. Return True only if the same jewelry item is detected in both images
+        return ImageValidation(matches=False, similarity=0.0, detail="Both image URLs are required")
     
-    # For demonstration purposes, we'll log that validation was attempted
     logging.info(f"Validating jewelry match between product image: {product_image_url} and model image: {model_image_url}")
-    
-    # For now, we'll return True if both URLs are provided
-    # In a real implementation, this would be replaced with actual image comparison logic
-    return True
+    if IMAGE_VALIDATION_MODE == "off":
+        return ImageValidation(matches=True)
+    try:
+        product_print, model_print = await asyncio.gather(
+            fingerprint_url(product_image_url), fingerprint_url(model_image_url)
+        )
+    except ImageFetchError as e:
+        if IMAGE_VALIDATION_MODE == "lenient":
+            logging.warning(f"Skipping image comparison: {e}")
+            return ImageValidation(matches=True, detail=str(e))
+        return ImageValidation(matches=False, similarity=0.0, detail=str(e), retryable=True)
+    similarity = round(image_similarity(product_print, model_print), 4)
+    if similarity >= IMAGE_MATCH_THRESHOLD:
+        return ImageValidation(matches=True, similarity=similarity)
+    detail = f"Image similarity {similarity:.2f} is below {IMAGE_MATCH_THRESHOLD:.2f}"
+    return ImageValidation(matches=IMAGE_VALIDATION_MODE != "strict", similarity=similarity, detail=detail)
+
+def image_mismatch_detail(validation: ImageValidation) -> str:
+    return f"{MODEL_IMAGE_MISMATCH} ({validation.detail})" if validation.detail else MODEL_IMAGE_MISMATCH
+
+def duplicate_images_detail(product_ids: list) -> str:
+    return f"Product images duplicate existing products: {', '.join(product_ids)}"
 
 @api_router.put("/products/{product_id}", response_model=Product)
-async def update_product(product_id: str, product: ProductUpdate):
+async def update_product(
+    product_id: str,
+    product: ProductUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+):
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available")
     
-    existing_product = await db.products.find_one({"id": product_id})
-    if existing_product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
+    expected_version = if_match_version(if_match)
+    guard = {"id": product_id}
+    if expected_version is not None:
+        guard["version"] = expected_version
     update_data = product.dict(exclude_unset=True)
     
-    # Validate model image if both image URLs are being updated
-    if 'image_url' in update_data and 'model_image_url' in update_data:
-        if not await validate_model_image(update_data['image_url'], update_data['model_image_url']):
-            raise HTTPException(
-                status_code=400, 
-                detail="The model image must show the same jewelry as the product image. Please ensure consistency."
-            )
-    # If only model_image_url is being updated, validate against existing product image
-    elif 'model_image_url' in update_data:
-        if not await validate_model_image(existing_product['image_url'], update_data['model_image_url']):
-            raise HTTPException(
-                status_code=400, 
-                detail="The model image must show the same jewelry as the product image. Please ensure consistency."
-            )
-    # If only image_url is being updated, validate against existing model image
-    elif 'image_url' in update_data:
-        if not await validate_model_image(update_data['image_url'], existing_product['model_image_url']):
-            raise HTTPException(
-                status_code=400, 
-                detail="The model image must show the same jewelry as the product image. Please ensure consistency."
+    # A single new image is validated against the stored counterpart, which must
+    # still be unchanged when the update is applied
+    existing_product = {}
+    if ('image_url' in update_data) != ('model_image_url' in update_data):
+        counterpart = 'model_image_url' if 'image_url' in update_data else 'image_url'
+        projection = {"_id": 0, "image_url": 1, "model_image_url": 1, "version": 1}
+        with Span("db"):
+            existing_product = await db.products.find_one({"id": product_id}, projection)
+        if existing_product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if expected_version is not None and existing_product.get("version", 1) != expected_version:
+            raise HTTPException(status_code=409, detail=PRODUCT_VERSION_CONFLICT)
+        guard.update({counterpart: existing_product[counterpart], "version": existing_product.get("version", 1)})
+    
+    # Validate the new image against its counterpart (new or existing)
+    image_pair = model_image_pair(update_data, existing_product)
+    if image_pair and IMAGE_VALIDATION_ASYNC:
+        update_data.update(validation_status="pending", validation_detail=None)
+    elif image_pair:
+        with Span("validate"):
+            validation = await validate_model_image(*image_pair)
+        if not validation.matches:
+            raise HTTPException(status_code=400, detail=image_mismatch_detail(validation))
+        update_data.update(validation_status="validated", validation_detail=validation.detail)
+    
+    with Span("db"):
+        if update_data:
+            updated_product = await db.products.find_one_and_update(
+                guard,
+                {"$set": update_data, "$inc": {"version": 1}},
+                return_document=ReturnDocument.AFTER,
             )
+        else:
+            updated_product = await db.products.find_one(guard)
+    if updated_product is None:
+        if await db.products.count_documents({"id": product_id}, limit=1) == 0:
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=409, detail=PRODUCT_VERSION_CONFLICT)
     
+    if image_pair and IMAGE_VALIDATION_ASYNC:
+        await validation_workers.enqueue(product_id, *image_pair)
+        response.status_code = 202
     if update_data:
-        await db.products.update_one(
-            {"id": product_id}, 
-            {"$set": update_data}
+        on_product_written(updated_product)
+    body = encode_json(product_documents([updated_product], None)[0])
+    response.headers["ETag"] = product_etag(updated_product, body)
+    return json_response(response, body)
+
+# Background image validation
+# With IMAGE_VALIDATION_ASYNC=true, product writes that need image validation are
+# stored as "pending" and answered with 202; a validation_jobs document is queued
+# and a pool of VALIDATION_WORKERS tasks per process claims jobs atomically, so any
+# number of workers can share the queue. A job whose images cannot be fetched is
+# retried with exponential backoff up to VALIDATION_MAX_ATTEMPTS, and a job left
+# running past its lease (a worker died) is picked up again. The result only
+# applies if the product still has the validated images.
+IMAGE_VALIDATION_ASYNC = os.environ.get('IMAGE_VALIDATION_ASYNC', 'false').lower() == 'true'
+VALIDATION_WORKERS = int(os.environ.get('VALIDATION_WORKERS', '4'))
+VALIDATION_MAX_ATTEMPTS = int(os.environ.get('VALIDATION_MAX_ATTEMPTS', '5'))
+VALIDATION_RETRY_DELAY = float(os.environ.get('VALIDATION_RETRY_DELAY', '30'))
+VALIDATION_LEASE = 300
+VALIDATION_POLL_INTERVAL = 5
+
+class ValidationWorkerPool:
+    def __init__(self, size: int):
+        self.size = size
+        self.tasks = []
+        self.wakeup = asyncio.Event()
+        self.validated = 0
+        self.rejected = 0
+        self.retried = 0
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.size)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def enqueue(self, product_id: str, image_url: str, model_image_url: str):
+        now = datetime.utcnow()
+        await db.validation_jobs.insert_one({
+            "id": str(uuid.uuid4()),
+            "product_id": product_id,
+            "image_url": image_url,
+            "model_image_url": model_image_url,
+            "status": "queued",
+            "attempts": 0,
+            "run_at": now,
+            "lease_until": None,
+            "error": None,
+            "created_at": now,
+        })
+        self.wakeup.set()
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await db.validation_jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lte": now}},
+            ]},
+            {
+                "$set": {"status": "running", "lease_until": now + timedelta(seconds=VALIDATION_LEASE)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER,
         )
-    
-    updated_product = await db.products.find_one({"id": product_id})
-    return Product(**updated_product)
+
+    async def _work(self):
+        while True:
+            try:
+                job = await self._claim()
+                if job is not None:
+                    await self._run(job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A claimed job is retried once its lease expires
+                logging.error(f"Image validation worker error: {e}")
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), VALIDATION_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job: dict):
+        if job["attempts"] > VALIDATION_MAX_ATTEMPTS:
+            # Its earlier attempts crashed or were interrupted
+            await self._finish(job, "rejected", job["error"] or "Image validation did not complete")
+            return
+        validation = await validate_model_image(job["image_url"], job["model_image_url"])
+        if validation.retryable:
+            await self._retry_or_reject(job, image_mismatch_detail(validation))
+            return
+        rejection = None if validation.matches else image_mismatch_detail(validation)
+        if rejection is None and DUPLICATE_IMAGE_POLICY == "reject":
+            duplicates = await duplicate_images(job["image_url"], job["model_image_url"])
+            duplicate_ids = list(dict.fromkeys(
+                match.product_id for match in duplicates if match.product_id != job["product_id"]
+            ))
+            if duplicate_ids:
+                rejection = duplicate_images_detail(duplicate_ids)
+        # A lenient pass keeps its unenforced score as the detail
+        await self._finish(job, "validated" if rejection is None else "rejected", rejection or validation.detail)
+
+    async def _retry_or_reject(self, job: dict, error: str):
+        if job["attempts"] >= VALIDATION_MAX_ATTEMPTS:
+            await self._finish(job, "rejected", error)
+            return
+        self.retried += 1
+        delay = VALIDATION_RETRY_DELAY * 2 ** (job["attempts"] - 1)
+        await db.validation_jobs.update_one({"id": job["id"]}, {"$set": {
+            "status": "queued",
+            "run_at": datetime.utcnow() + timedelta(seconds=delay),
+            "lease_until": None,
+            "error": error,
+        }})
+
+    async def _finish(self, job: dict, status: str, detail: Optional[str]):
+        product = await db.products.find_one_and_update(
+            {
+                "id": job["product_id"],
+                "image_url": job["image_url"],
+                "model_image_url": job["model_image_url"],
+                "validation_status": "pending",
+            },
+            {"$set": {"validation_status": status, "validation_detail": detail}},
+            return_document=ReturnDocument.AFTER,
+        )
+        await db.validation_jobs.update_one({"id": job["id"]}, {"$set": {
+            "status": "done",
+            "result": status,
+            "lease_until": None,
+            "error": detail,
+        }})
+        if product is None:
+            # Deleted, or its images changed and a newer job covers them
+            return
+        if status == "validated":
+            self.validated += 1
+        else:
+            self.rejected += 1
+            logging.warning(f"Product {job['product_id']} rejected: {detail}")
+        on_product_written(product)
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self.tasks),
+            "validated": self.validated,
+            "rejected": self.rejected,
+            "retried": self.retried,
+        }
+
+validation_workers = ValidationWorkerPool(VALIDATION_WORKERS)
 
 @api_router.delete("/products/{product_id}")
-async def delete_product(product_id: str):
+async def delete_product(product_id: str, if_match: Optional[str] = Header(None)):
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available")
     
-    result = await db.products.delete_one({"id": product_id})
+    expected_version = if_match_version(if_match)
+    query = {"id": product_id}
+    if expected_version is not None:
+        query["version"] = expected_version
+    with Span("db"):
+        result = await db.products.delete_one(query)
     if result.deleted_count == 0:
+        if expected_version is not None and await db.products.count_documents({"id": product_id}, limit=1):
+            raise HTTPException(status_code=409, detail=PRODUCT_VERSION_CONFLICT)
         raise HTTPException(status_code=404, detail="Product not found")
+    on_product_deleted(product_id)
     return {"message": "Product deleted successfully"}
 
+# Bulk product writes
+# Accepts a JSON array or an NDJSON stream (Content-Type: application/x-ndjson) of
+# {"op": "create" | "update" | "delete", "id": ..., "product": {...}} items. Items are
+# validated one by one and written in unordered bulk_write chunks; an id that appears
+# twice starts a new chunk so operations on the same product keep their order.
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', '1000'))
+BULK_VALIDATION_CONCURRENCY = 32
+
+async def read_bulk_items(request: Request):
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+    try:
+        items = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for item in items:
+        yield item
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+
+def parse_bulk_item(raw):
+    if isinstance(raw, bytes):
+        raw = json.loads(raw)
+    operation = BulkOperation(**raw)
+    if operation.op == "create":
+        product = Product(**ProductCreate(**(operation.product or {})).dict())
+        return operation.op, product.id, product.dict()
+    if not operation.id:
+        raise ValueError("id is required for update and delete")
+    if operation.op == "update":
+        return operation.op, operation.id, ProductUpdate(**(operation.product or {})).dict(exclude_unset=True)
+    return operation.op, operation.id, None
+
+async def run_bulk_chunk(chunk: list, result: BulkResult):
+    def fail(index, op, product_id, status, error):
+        result.items.append(BulkItemResult(index=index, op=op, id=product_id, status=status, error=error))
+        result.failed += 1
+
+    existing_ids = [product_id for _, op, product_id, _ in chunk if op != "create"]
+    existing = {}
+    if existing_ids:
+        projection = {"_id": 0, "id": 1, "image_url": 1, "model_image_url": 1}
+        async for product in db.products.find({"id": {"$in": existing_ids}}, projection):
+            existing[product["id"]] = product
+
+    # Image pairs are checked concurrently, as the real check fetches both images
+    semaphore = asyncio.Semaphore(BULK_VALIDATION_CONCURRENCY)
+
+    async def check_images(index, op, product_id, data):
+        # Returns an error message, or None if the item may be written
+        if op == "delete" or (op == "update" and product_id not in existing):
+            return None
+        if op == "create":
+            pair = (data["image_url"], data["model_image_url"])
+        else:
+            pair = model_image_pair(data, existing[product_id])
+        if pair is None:
+            return None
+        async with semaphore:
+            validation = await validate_model_image(*pair)
+        return None if validation.matches else image_mismatch_detail(validation)
+
+    checks = await asyncio.gather(*(check_images(*item) for item in chunk))
+    operations, pending = [], []
+    for (index, op, product_id, data), image_error in zip(chunk, checks):
+        if op != "create" and product_id not in existing:
+            fail(index, op, product_id, 404, "Product not found")
+        elif image_error:
+            fail(index, op, product_id, 400, image_error)
+        else:
+            if op == "create":
+                operations.append(InsertOne(data))
+            elif op == "update":
+                if model_image_pair(data, existing[product_id]):
+                    # Supersedes any background validation still pending
+                    data.update(validation_status="validated", validation_detail=None)
+                operations.append(
+                    UpdateOne({"id": product_id}, {"$set": data, "$inc": {"version": 1}}) if data else None
+                )
+            else:
+                operations.append(DeleteOne({"id": product_id}))
+            pending.append((index, op, product_id, data))
+
+    write_errors = {}
+    writes = [operation for operation in operations if operation is not None]
+    if writes:
+        try:
+            await db.products.bulk_write(writes, ordered=False)
+        except BulkWriteError as e:
+            positions = [position for position, operation in enumerate(operations) if operation is not None]
+            for error in e.details.get("writeErrors", []):
+                write_errors[positions[error["index"]]] = error
+
+    written, updated_ids = [], []
+    for position, (index, op, product_id, data) in enumerate(pending):
+        error = write_errors.get(position)
+        if error is not None:
+            status = 409 if error.get("code") == 11000 else 500
+            fail(index, op, product_id, status, error.get("errmsg"))
+            continue
+        if op == "create":
+            written.append(data)
+            result.created += 1
+        elif op == "update":
+            if data:
+                updated_ids.append(product_id)
+            result.updated += 1
+        else:
+            on_product_deleted(product_id)
+            result.deleted += 1
+        result.items.append(BulkItemResult(index=index, op=op, id=product_id, status=201 if op == "create" else 200))
+    if updated_ids:
+        written.extend(await db.products.find({"id": {"$in": updated_ids}}, PRODUCT_INDEX_PROJECTION).to_list(None))
+    return written
+
+@api_router.post("/products/bulk", response_model=BulkResult)
+async def bulk_products(request: Request):
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    result = BulkResult()
+    chunk, chunk_ids, written = [], set(), []
+    index = -1
+    async for raw in read_bulk_items(request):
+        index += 1
+        try:
+            op, product_id, data = parse_bulk_item(raw)
+        except ValidationError as e:
+            result.items.append(BulkItemResult(index=index, status=422, error=validation_message(e)))
+            result.failed += 1
+            continue
+        except (ValueError, TypeError) as e:
+            result.items.append(BulkItemResult(index=index, status=400, error=str(e)))
+            result.failed += 1
+            continue
+        if product_id in chunk_ids or len(chunk) >= BULK_CHUNK_SIZE:
+            written.extend(await run_bulk_chunk(chunk, result))
+            chunk, chunk_ids = [], set()
+        chunk.append((index, op, product_id, data))
+        chunk_ids.add(product_id)
+    if chunk:
+        written.extend(await run_bulk_chunk(chunk, result))
+    on_products_written(written)
+    result.items.sort(key=lambda item: item.index)
+    return result
+
+# Admin: near-duplicate product images
+@api_router.get("/admin/images/duplicates")
+async def get_duplicate_images(
+    max_distance: Optional[int] = Query(None, ge=0, le=DUPLICATE_MAX_DISTANCE),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    clusters = duplicate_index.clusters(max_distance)
+    return {
+        "max_distance": DUPLICATE_MAX_DISTANCE if max_distance is None else max_distance,
+        "indexed_images": len(duplicate_index.hashes),
+        # Images not fingerprinted yet are missing from the clusters
+        "pending_images": len(duplicate_index.urls) - len(duplicate_index.hashes),
+        "clusters": [
+            {
+                "product_ids": list(dict.fromkeys(product_id for product_id, _ in keys)),
+                "images": [
+                    {"product_id": product_id, "kind": kind, "url": duplicate_index.urls[(product_id, kind)]}
+                    for product_id, kind in keys
+                ],
+            }
+            for keys in clusters[:limit]
+        ],
+    }
+
+# Image health crawler
+# Checks every distinct product image URL and stores the result on each product as
+# image_health.<image_url|model_image_url>. URLs are interleaved by host and checked
+# by IMAGE_HEALTH_CONCURRENCY workers, with at most IMAGE_HEALTH_PER_HOST requests in
+# flight per host. A HEAD request is tried first; hosts that refuse it or omit the
+# length get a streamed GET. A lease in image_health_runs keeps processes from
+# crawling at the same time. IMAGE_HEALTH_INTERVAL (seconds) schedules crawls;
+# 0 leaves them to the admin endpoint.
+IMAGE_HEALTH_INTERVAL = float(os.environ.get('IMAGE_HEALTH_INTERVAL', '0'))
+IMAGE_HEALTH_CONCURRENCY = int(os.environ.get('IMAGE_HEALTH_CONCURRENCY', '50'))
+IMAGE_HEALTH_PER_HOST = int(os.environ.get('IMAGE_HEALTH_PER_HOST', '6'))
+IMAGE_HEALTH_SLOW_MS = float(os.environ.get('IMAGE_HEALTH_SLOW_MS', '2000'))
+IMAGE_HEALTH_LEASE = 600
+IMAGE_HEALTH_STATUSES = ("ok", "slow", "broken")
+
+async def check_image(url: str) -> dict:
+    result = {"url": url, "http_status": None, "bytes": None, "content_type": None, "error": None}
+    started = time.perf_counter()
+    try:
+        async with open_image("HEAD", url) as response:
+            length = response.headers.get("content-length")
+        if response.status_code not in (404, 410) and not (response.status_code == 200 and length):
+            async with open_image("GET", url) as response:
+                length = response.headers.get("content-length")
+                if response.status_code == 200 and length is None:
+                    size = 0
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > IMAGE_MAX_BYTES:
+                            break
+                    length = size
+        result.update(
+            http_status=response.status_code,
+            bytes=int(length) if length is not None else None,
+            content_type=response.headers.get("content-type"),
+        )
+    except (httpx.HTTPError, ImageFetchError) as e:
+        result["error"] = str(e) or type(e).__name__
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    result["checked_at"] = datetime.utcnow()
+    content_type = (result["content_type"] or "").split(";")[0].strip()
+    if result["error"] is None and result["http_status"] != 200:
+        result["error"] = f"HTTP {result['http_status']}"
+    elif result["error"] is None and not content_type.startswith("image/") and content_type != "application/octet-stream":
+        result["error"] = f"Unexpected content type {content_type or 'none'}"
+    if result["error"] is not None:
+        result["status"] = "broken"
+    elif result["latency_ms"] > IMAGE_HEALTH_SLOW_MS:
+        result["status"] = "slow"
+    else:
+        result["status"] = "ok"
+    return result
+
+def interleave_by_host(urls) -> list:
+    # Round-robin over hosts so the workers spread across them
+    position, keyed = {}, []
+    for url in urls:
+        host = urlsplit(url).hostname
+        rank = position.get(host, 0)
+        position[host] = rank + 1
+        keyed.append((rank, url))
+    keyed.sort()
+    return [url for _, url in keyed]
+
+class ImageHealthCrawler:
+    def __init__(self):
+        self.task = None
+        self.total = 0
+        self.checked = 0
+        self.counts = dict.fromkeys(IMAGE_HEALTH_STATUSES, 0)
+        self.started_at = None
+
+    async def start(self) -> bool:
+        # False if this process or another one is already crawling
+        if self.task is not None and not self.task.done():
+            return False
+        if not await self._acquire():
+            return False
+        self.task = asyncio.create_task(self._crawl())
+        return True
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def _acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            await db.image_health_runs.update_one(
+                {"_id": "crawler", "$or": [{"lease_until": None}, {"lease_until": {"$lte": now}}]},
+                {"$set": {"lease_until": now + timedelta(seconds=IMAGE_HEALTH_LEASE), "started_at": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Another process holds the lease
+            return False
+        return True
+
+    async def _flush(self, results: list):
+        # Writes that only touch image_health are filtered out of the products change
+        # stream (see PRODUCT_CHANGE_PIPELINE), so no worker invalidates on a crawl
+        operations = [
+            UpdateMany({kind: result["url"]}, {"$set": {f"image_health.{kind}": result}})
+            for result in results
+            for kind in PRODUCT_IMAGE_KINDS
+        ]
+        for start in range(0, len(operations), BULK_CHUNK_SIZE):
+            await db.products.bulk_write(operations[start:start + BULK_CHUNK_SIZE], ordered=False)
+        lease_until = datetime.utcnow() + timedelta(seconds=IMAGE_HEALTH_LEASE)
+        await db.image_health_runs.update_one({"_id": "crawler"}, {"$set": {"lease_until": lease_until}})
+
+    async def crawl(self):
+        if db is None or not await self._acquire():
+            return
+        await self._crawl()
+
+    async def _crawl(self):
+        self.started_at = datetime.utcnow()
+        self.checked = 0
+        self.counts = dict.fromkeys(IMAGE_HEALTH_STATUSES, 0)
+        try:
+            urls = set()
+            projection = {"_id": 0, "image_url": 1, "model_image_url": 1}
+            async for product in db.products.find({}, projection):
+                urls.update(product.get(kind) for kind in PRODUCT_IMAGE_KINDS if product.get(kind))
+            self.total = len(urls)
+            queue = iter(interleave_by_host(urls))
+            host_limits = {}
+            pending = []
+
+            async def worker():
+                nonlocal pending
+                for url in queue:
+                    host = urlsplit(url).hostname
+                    limit = host_limits.setdefault(host, asyncio.Semaphore(IMAGE_HEALTH_PER_HOST))
+                    async with limit:
+                        result = await check_image(url)
+                    self.checked += 1
+                    self.counts[result["status"]] += 1
+                    pending.append(result)
+                    if len(pending) >= BULK_CHUNK_SIZE:
+                        results, pending = pending, []
+                        await self._flush(results)
+
+            workers = [asyncio.ensure_future(worker()) for _ in range(IMAGE_HEALTH_CONCURRENCY)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+            if pending:
+                await self._flush(pending)
+            logger.info(f"Image health crawl checked {self.checked} images: {self.counts}")
+        finally:
+            await db.image_health_runs.update_one({"_id": "crawler"}, {"$set": {
+                "lease_until": None,
+                "finished_at": datetime.utcnow(),
+                "checked": self.checked,
+                "counts": self.counts,
+            }})
+
+    async def run_schedule(self):
+        while True:
+            last_run = await db.image_health_runs.find_one({"_id": "crawler"}) or {}
+            due = datetime.utcnow()
+            if last_run.get("finished_at"):
+                due = last_run["finished_at"] + timedelta(seconds=IMAGE_HEALTH_INTERVAL)
+            if last_run.get("lease_until"):
+                # Another process is crawling; check again when its lease ends
+                due = max(due, last_run["lease_until"])
+            await asyncio.sleep(max((due - datetime.utcnow()).total_seconds(), 0) + 1)
+            try:
+                await self.crawl()
+            except Exception as e:
+                logger.error(f"Image health crawl failed: {e}")
+                await asyncio.sleep(60)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.task is not None and not self.task.done(),
+            "total": self.total,
+            "checked": self.checked,
+            **self.counts,
+        }
+
+image_health_crawler = ImageHealthCrawler()
+image_health_task = None
+
+@api_router.post("/admin/images/health/crawl", status_code=202)
+async def start_image_health_crawl():
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    started = await image_health_crawler.start()
+    return {"started": started, **image_health_crawler.stats()}
+
+@api_router.get("/admin/images/health")
+async def get_image_health(
+    status: Literal["ok", "slow", "broken"] = "broken",
+    limit: int = Query(100, ge=1, le=1000),
+):
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    last_run = await db.image_health_runs.find_one({"_id": "crawler"}, {"_id": 0})
+    query = {"$or": [{f"image_health.{kind}.status": status} for kind in PRODUCT_IMAGE_KINDS]}
+    projection = {"_id": 0, "id": 1, "name": 1, "image_health": 1}
+    products = await db.products.find(query, projection).sort("id", 1).to_list(limit)
+    return {"crawler": image_health_crawler.stats(), "last_run": last_run, "products": products}
+
+# Image resizing proxy
+# Serves product images at a bounded set of widths as WebP or JPEG. Originals and
+# derivatives are kept in a size-bounded LRU directory (IMAGE_CACHE_DIR), so each
+# original is downloaded once and each derivative encoded once; concurrent requests
+# for the same file share one fetch. Responses are cacheable for a week and carry an
+# ETag derived from the source URL, width and format.
+IMAGE_CACHE_DIR = Path(os.environ.get('IMAGE_CACHE_DIR', str(ROOT_DIR / 'image_cache')))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+IMAGE_PROXY_CACHE_CONTROL = os.environ.get(
+    'IMAGE_PROXY_CACHE_CONTROL', 'public, max-age=604800, stale-while-revalidate=86400'
+)
+IMAGE_PROXY_WIDTHS = (160, 320, 480, 640, 960, 1280, 1600)
+IMAGE_PROXY_FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+IMAGE_PROXY_KINDS = {"image": "image_url", "model": "model_image_url"}
+
+class DiskCache:
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.loaded = False
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _scan(self) -> list:
+        # Files left by earlier runs, least recently used first
+        found = []
+        for path in self.directory.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, path, stat.st_size))
+        found.sort()
+        return [(path, size) for _, path, size in found]
+
+    async def _load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        for path, size in await asyncio.to_thread(self._scan):
+            if path not in self.entries:
+                self.entries[path] = size
+                self.size += size
+
+    def path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / digest[:2] / digest
+
+    @staticmethod
+    def _read(path: Path) -> bytes:
+        data = path.read_bytes()
+        # The modification time records recency for the next process to scan
+        os.utime(path)
+        return data
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def _remove(paths: list):
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    async def get(self, key: str, produce) -> bytes:
+        await self._load()
+        path = self.path(key)
+        if path in self.entries:
+            try:
+                data = await asyncio.to_thread(self._read, path)
+            except FileNotFoundError:
+                # Evicted by another process sharing the directory
+                self.size -= self.entries.pop(path, 0)
+            else:
+                if path in self.entries:
+                    self.entries.move_to_end(path)
+                self.hits += 1
+                return data
+        pending = self.inflight.get(path)
+        if pending is None:
+            pending = self.inflight[path] = asyncio.ensure_future(self._fill(path, produce))
+            pending.add_done_callback(lambda _: self.inflight.pop(path, None))
+        return await asyncio.shield(pending)
+
+    async def _fill(self, path: Path, produce) -> bytes:
+        self.misses += 1
+        data = await produce()
+        await asyncio.to_thread(self._write, path, data)
+        self.size += len(data) - self.entries.pop(path, 0)
+        self.entries[path] = len(data)
+        evicted = []
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            old_path, old_size = self.entries.popitem(last=False)
+            self.size -= old_size
+            evicted.append(old_path)
+        if evicted:
+            await asyncio.to_thread(self._remove, evicted)
+        return data
+
+    def stats(self) -> dict:
+        return {"files": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+image_cache = DiskCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+
+def resize_image(data: bytes, width: int, fmt: str) -> bytes:
+    image_format, _ = IMAGE_PROXY_FORMATS[fmt]
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # JPEGs decode straight at a reduced scale no smaller than the target
+            image.draft("RGB", (width, 1))
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha and fmt == "webp" else "RGB")
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                image = image.resize((width, height), Image.LANCZOS)
+            output = io.BytesIO()
+            if fmt == "webp":
+                image.save(output, image_format, quality=80, method=4)
+            else:
+                image.save(output, image_format, quality=82, optimize=True, progressive=True)
+            return output.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageFetchError("not a readable image") from e
+
+async def original_image(url: str) -> bytes:
+    async def download():
+        data, _ = await fetch_image(url)
+        return data
+    return await image_cache.get(f"{url}\noriginal", download)
+
+@api_router.get("/images/{product_id}/{kind}")
+async def get_product_image(
+    request: Request,
+    product_id: str,
+    kind: Literal["image", "model"],
+    w: Optional[int] = Query(None, ge=1),
+    fmt: Optional[Literal["webp", "jpeg"]] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    field = IMAGE_PROXY_KINDS[kind]
+    url = product_cache.get(("image", product_id, field))
+    if url is None:
+        generation = product_cache.generation
+        product = await db.products.find_one({"id": product_id}, {"_id": 0, field: 1})
+        if product is None or not product.get(field):
+            raise HTTPException(status_code=404, detail="Product not found")
+        url = product[field]
+        product_cache.set(("image", product_id, field), url, generation)
+    
+    # Snap to a configured width so the cache holds a bounded number of variants
+    width = next((size for size in IMAGE_PROXY_WIDTHS if w and size >= w), IMAGE_PROXY_WIDTHS[-1])
+    if fmt is None:
+        fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    key = f"{url}\n{width}\n{fmt}"
+    headers = {
+        "Cache-Control": IMAGE_PROXY_CACHE_CONTROL,
+        "ETag": f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"',
+        "Vary": "Accept",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    async def derive():
+        with Span("fetch"):
+            original = await original_image(url)
+        with Span("resize"):
+            return await asyncio.to_thread(resize_image, original, width, fmt)
+    
+    try:
+        data = await image_cache.get(key, derive)
+    except ImageFetchError as e:
+        raise HTTPException(status_code=502, detail=f"Could not load image: {e}")
+    return Response(content=data, media_type=IMAGE_PROXY_FORMATS[fmt][1], headers=headers)
+
+# Contact write-behind
+# With CONTACT_WRITE_BEHIND=true, submissions are queued in memory and a single
+# flusher writes them with insert_many once CONTACT_BATCH_SIZE are waiting or
+# CONTACT_FLUSH_INTERVAL seconds have passed. The queue holds CONTACT_QUEUE_SIZE
+# submissions; when it is full, requests wait up to CONTACT_ENQUEUE_TIMEOUT seconds
+# for room and then get 503. A contact is acknowledged once queued, so anything
+# still queued when the process dies is lost; shutdown drains the queue first.
+CONTACT_WRITE_BEHIND = os.environ.get('CONTACT_WRITE_BEHIND', 'false').lower() == 'true'
+CONTACT_BATCH_SIZE = int(os.environ.get('CONTACT_BATCH_SIZE', '500'))
+CONTACT_FLUSH_INTERVAL = float(os.environ.get('CONTACT_FLUSH_INTERVAL', '0.05'))
+CONTACT_QUEUE_SIZE = int(os.environ.get('CONTACT_QUEUE_SIZE', '10000'))
+CONTACT_ENQUEUE_TIMEOUT = float(os.environ.get('CONTACT_ENQUEUE_TIMEOUT', '5'))
+CONTACT_FLUSH_RETRIES = 3
+
+def contact_write_concern() -> WriteConcern:
+    # CONTACT_WRITE_CONCERN is a w value: a node count such as "1", or "majority"
+    w = os.environ.get('CONTACT_WRITE_CONCERN', '1')
+    return WriteConcern(w=int(w) if w.isdigit() else w)
+
+class ContactWriter:
+    def __init__(self, batch_size: int, interval: float, queue_size: int):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue_size = queue_size
+        self.queue = None
+        self.task = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        self.queue = asyncio.Queue(self.queue_size)
+        self.task = asyncio.create_task(self._run())
+
+    async def submit(self, document: dict):
+        try:
+            await asyncio.wait_for(self.queue.put(document), CONTACT_ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Too many contact submissions, please retry shortly")
+
+    async def stop(self):
+        if not self.running:
+            return
+        # The flusher writes everything queued before the sentinel, then exits
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        collection = db.contacts.with_options(write_concern=contact_write_concern())
+        while True:
+            first = await self.queue.get()
+            if first is None:
+                return
+            batch, stopping = [first], False
+            deadline = loop.time() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    document = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        document = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if document is None:
+                    stopping = True
+                    break
+                batch.append(document)
+            await self._flush(collection, batch)
+            if stopping:
+                return
+
+    async def _flush(self, collection, batch: list):
+        delay = 0.5
+        for attempt in range(CONTACT_FLUSH_RETRIES):
+            try:
+                await collection.insert_many(batch, ordered=False)
+                break
+            except BulkWriteError as e:
+                # A retry re-sends documents that already made it in; only other errors count
+                if all(error.get("code") == 11000 for error in e.details.get("writeErrors", [])):
+                    break
+                failure = e
+            except Exception as e:
+                failure = e
+            if attempt < CONTACT_FLUSH_RETRIES - 1:
+                await asyncio.sleep(delay)
+                delay *= 2
+        else:
+            self.dropped += len(batch)
+            logger.error(f"Dropped {len(batch)} contact submissions after {CONTACT_FLUSH_RETRIES} attempts: {failure}")
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+contact_writer = ContactWriter(CONTACT_BATCH_SIZE, CONTACT_FLUSH_INTERVAL, CONTACT_QUEUE_SIZE)
+
 # Contact Routes
+CONTACT_FIELDS = tuple(Contact.model_fields)
+
 @api_router.post("/contact", response_model=Contact)
 async def create_contact(contact: ContactCreate):
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available")
     
-    contact_dict = contact.dict()
-    contact_obj = Contact(**contact_dict)
-    await db.contacts.insert_one(contact_obj.dict())
+    with Span("model"):
+        contact_dict = contact.dict()
+        contact_obj = Contact(**contact_dict)
+    with Span("db"):
+        if contact_writer.running:
+            await contact_writer.submit(contact_obj.dict())
+        else:
+            await db.contacts.insert_one(contact_obj.dict())
     return contact_obj
 
 @api_router.get("/contacts", response_model=List[Contact])
@@ -224,161 +2606,255 @@ async def get_contacts():
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available")
     
-    contacts = await db.contacts.find().to_list(1000)
-    return [Contact(**contact) for contact in contacts]
+    projection = {"_id": 0, **{field: 1 for field in CONTACT_FIELDS}}
+    with Span("db"):
+        contacts = await db.contacts.find({}, projection).sort("created_at", 1).to_list(1000)
+    return Response(
+        content=encode_json([{field: contact.get(field) for field in CONTACT_FIELDS} for contact in contacts]),
+        media_type="application/json",
+    )
 
-# Initialize sample data
-@api_router.post("/init-data")
-async def init_sample_data():
+# Contact export
+# Streams every matching contact straight from the cursor, one batch at a time, so
+# memory stays flat however many contacts there are.
+CONTACT_EXPORT_BATCH_SIZE = 1000
+
+def utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    # created_at is stored as naive UTC
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+# Phone numbers and other plain numbers may start with + or - but cannot hold a formula
+PLAIN_NUMBER_RE = re.compile(r"[+-]?[0-9][0-9 ().-]*")
+
+def csv_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    value = str(value)
+    # Keep spreadsheet apps from evaluating user input as a formula; some also skip
+    # a leading tab or carriage return before looking for one
+    if value.startswith(("=", "@", "\t", "\r")) or (value.startswith(("+", "-")) and not PLAIN_NUMBER_RE.fullmatch(value)):
+        return "'" + value
+    return value
+
+async def export_contact_rows(query: dict, export_format: str):
+    projection = {"_id": 0, **{field: 1 for field in CONTACT_FIELDS}}
+    cursor = db.contacts.find(query, projection).sort("created_at", 1).batch_size(CONTACT_EXPORT_BATCH_SIZE)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(CONTACT_FIELDS)
+    rows = 0
+    async for contact in cursor:
+        if export_format == "csv":
+            writer.writerow([csv_cell(contact.get(field)) for field in CONTACT_FIELDS])
+        else:
+            record = {field: contact.get(field) for field in CONTACT_FIELDS}
+            buffer.write(json.dumps(record, default=datetime.isoformat) + "\n")
+        rows += 1
+        if rows % CONTACT_EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@api_router.get("/contacts/export")
+async def export_contacts(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available")
     
-    # Clear existing products first to ensure fresh data
-    await db.products.delete_many({})
-    
-    # Create sample products with matching product and model images
-    # Each model image has been carefully selected to show the EXACT same jewelry as the product image
-    sample_products = [
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Elegant Diamond Earrings",
-            "description": "Exquisite diamond earrings crafted with precision and elegance. These stunning pieces feature premium diamonds set in 18k gold, perfect for special occasions or adding luxury to everyday wear.",
-            "price": 2500.00,
-            "category": "Earrings",
-            "image_url": "https://images.unsplash.com/photo-1720686615374-ea04dac6a66e",
-            "model_image_url": "https://images.unsplash.com/photo-1616121341778-0dd435d03d23",  # Model wearing the EXACT same Elegant Diamond Earrings
-            "material_details": {
-                "material": "18k Gold",
-                "gemstones": "Natural Diamonds",
-                "weight": "3.2g",
-                "origin": "Switzerland"
-            },
-            "is_featured": True,
-            "created_at": datetime.utcnow()
+    created_at = {}
+    if since is not None:
+        created_at["$gte"] = utc_naive(since)
+    if until is not None:
+        created_at["$lt"] = utc_naive(until)
+    query = {"created_at": created_at} if created_at else {}
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"contacts-{datetime.utcnow():%Y%m%dT%H%M%S}.{export_format}"
+    return StreamingResponse(
+        export_contact_rows(query, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# Initialize sample data
+# Canonical sample catalog
+# init-data reconciles these products by name rather than replacing the collection,
+# so it is safe on a catalog with real products: missing samples are inserted, samples
+# that differ from this list are updated, and every other product is left alone.
+# Each model image shows the EXACT same jewelry as the product image.
+SAMPLE_PRODUCTS = [
+    {
+        "name": "Elegant Diamond Earrings",
+        "description": "Exquisite diamond earrings crafted with precision and elegance. These stunning pieces feature premium diamonds set in 18k gold, perfect for special occasions or adding luxury to everyday wear.",
+        "price": 2500.00,
+        "category": "Earrings",
+        "image_url": "https://images.unsplash.com/photo-1720686615374-ea04dac6a66e",
+        "model_image_url": "https://images.unsplash.com/photo-1616121341778-0dd435d03d23",  # Model wearing the EXACT same Elegant Diamond Earrings
+        "material_details": {
+            "material": "18k Gold",
+            "gemstones": "Natural Diamonds",
+            "weight": "3.2g",
+            "origin": "Switzerland"
         },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Premium Gold Ring",
-            "description": "A timeless gold ring with sophisticated design, perfect for special occasions or everyday luxury. Crafted with attention to detail and premium materials.",
-            "price": 1800.00,
-            "category": "Rings",
-            "image_url": "https://images.unsplash.com/photo-1602751584547-5fb8e6c21740",
-            "model_image_url": "https://images.pexels.com/photos/7631686/pexels-photo-7631686.jpeg",  # Model wearing the EXACT same Premium Gold Ring
-            "material_details": {
-                "material": "18k Yellow Gold",
-                "gemstones": "None",
-                "weight": "5.8g",
-                "origin": "Italy"
-            },
-            "is_featured": True,
-            "created_at": datetime.utcnow()
+        "is_featured": True
+    },
+    {
+        "name": "Premium Gold Ring",
+        "description": "A timeless gold ring with sophisticated design, perfect for special occasions or everyday luxury. Crafted with attention to detail and premium materials.",
+        "price": 1800.00,
+        "category": "Rings",
+        "image_url": "https://images.unsplash.com/photo-1602751584547-5fb8e6c21740",
+        "model_image_url": "https://images.pexels.com/photos/7631686/pexels-photo-7631686.jpeg",  # Model wearing the EXACT same Premium Gold Ring
+        "material_details": {
+            "material": "18k Yellow Gold",
+            "gemstones": "None",
+            "weight": "5.8g",
+            "origin": "Italy"
         },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Diamond Eternity Ring",
-            "description": "Stunning diamond eternity ring with carefully selected diamonds, symbolizing everlasting love. Each diamond is hand-selected for maximum brilliance and fire.",
-            "price": 3200.00,
-            "category": "Rings",
-            "image_url": "https://images.unsplash.com/photo-1591210244853-ea68b6126edf",
-            "model_image_url": "https://images.pexels.com/photos/2740658/pexels-photo-2740658.jpeg",  # Model wearing the EXACT same Diamond Eternity Ring
-            "material_details": {
-                "material": "18k White Gold",
-                "gemstones": "Premium Diamonds",
-                "weight": "4.1g",
-                "origin": "Belgium"
-            },
-            "is_featured": True,
-            "created_at": datetime.utcnow()
+        "is_featured": True
+    },
+    {
+        "name": "Diamond Eternity Ring",
+        "description": "Stunning diamond eternity ring with carefully selected diamonds, symbolizing everlasting love. Each diamond is hand-selected for maximum brilliance and fire.",
+        "price": 3200.00,
+        "category": "Rings",
+        "image_url": "https://images.unsplash.com/photo-1591210244853-ea68b6126edf",
+        "model_image_url": "https://images.pexels.com/photos/2740658/pexels-photo-2740658.jpeg",  # Model wearing the EXACT same Diamond Eternity Ring
+        "material_details": {
+            "material": "18k White Gold",
+            "gemstones": "Premium Diamonds",
+            "weight": "4.1g",
+            "origin": "Belgium"
         },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Heart Pendant Necklace",
-            "description": "Delicate heart pendant necklace in sterling silver, perfect for expressing love and affection. The elegant design makes it suitable for any occasion.",
-            "price": 950.00,
-            "category": "Necklaces",
-            "image_url": "https://images.unsplash.com/photo-1589128530085-7e772389eb7a",
-            "model_image_url": "https://images.pexels.com/photos/6153885/pexels-photo-6153885.jpeg",  # Model wearing the EXACT same Heart Pendant Necklace
-            "material_details": {
-                "material": "Sterling Silver",
-                "gemstones": "None",
-                "weight": "2.3g",
-                "origin": "United Kingdom"
-            },
-            "is_featured": False,
-            "created_at": datetime.utcnow()
+        "is_featured": True
+    },
+    {
+        "name": "Heart Pendant Necklace",
+        "description": "Delicate heart pendant necklace in sterling silver, perfect for expressing love and affection. The elegant design makes it suitable for any occasion.",
+        "price": 950.00,
+        "category": "Necklaces",
+        "image_url": "https://images.unsplash.com/photo-1589128530085-7e772389eb7a",
+        "model_image_url": "https://images.pexels.com/photos/6153885/pexels-photo-6153885.jpeg",  # Model wearing the EXACT same Heart Pendant Necklace
+        "material_details": {
+            "material": "Sterling Silver",
+            "gemstones": "None",
+            "weight": "2.3g",
+            "origin": "United Kingdom"
         },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Minimalist Diamond Necklace",
-            "description": "Sophisticated minimalist necklace with a single diamond pendant, embodying modern elegance. The perfect piece for the contemporary woman.",
-            "price": 1200.00,
-            "category": "Necklaces",
-            "image_url": "https://images.unsplash.com/photo-1658729565278-7c09292d7184",
-            "model_image_url": "https://images.pexels.com/photos/28664773/pexels-photo-28664773.jpeg",  # Model wearing the EXACT same Minimalist Diamond Necklace
-            "material_details": {
-                "material": "18k Gold",
-                "gemstones": "Single Diamond",
-                "weight": "1.8g",
-                "origin": "France"
-            },
-            "is_featured": True,
-            "created_at": datetime.utcnow()
+        "is_featured": False
+    },
+    {
+        "name": "Minimalist Diamond Necklace",
+        "description": "Sophisticated minimalist necklace with a single diamond pendant, embodying modern elegance. The perfect piece for the contemporary woman.",
+        "price": 1200.00,
+        "category": "Necklaces",
+        "image_url": "https://images.unsplash.com/photo-1658729565278-7c09292d7184",
+        "model_image_url": "https://images.pexels.com/photos/28664773/pexels-photo-28664773.jpeg",  # Model wearing the EXACT same Minimalist Diamond Necklace
+        "material_details": {
+            "material": "18k Gold",
+            "gemstones": "Single Diamond",
+            "weight": "1.8g",
+            "origin": "France"
         },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Wedding Ring Set",
-            "description": "Perfectly matched wedding ring set crafted in premium gold, designed for couples who appreciate luxury. Each ring complements the other perfectly.",
-            "price": 2800.00,
-            "category": "Wedding Rings",
-            "image_url": "https://images.unsplash.com/photo-1717605877844-b506a1f5b914",
-            "model_image_url": "https://images.unsplash.com/photo-1623726564529-f07ede3b34be",  # Model wearing the EXACT same Wedding Ring Set
-            "material_details": {
-                "material": "18k Gold",
-                "gemstones": "None",
-                "weight": "12.5g",
-                "origin": "Italy"
-            },
-            "is_featured": True,
-            "created_at": datetime.utcnow()
+        "is_featured": True
+    },
+    {
+        "name": "Wedding Ring Set",
+        "description": "Perfectly matched wedding ring set crafted in premium gold, designed for couples who appreciate luxury. Each ring complements the other perfectly.",
+        "price": 2800.00,
+        "category": "Wedding Rings",
+        "image_url": "https://images.unsplash.com/photo-1717605877844-b506a1f5b914",
+        "model_image_url": "https://images.unsplash.com/photo-1623726564529-f07ede3b34be",  # Model wearing the EXACT same Wedding Ring Set
+        "material_details": {
+            "material": "18k Gold",
+            "gemstones": "None",
+            "weight": "12.5g",
+            "origin": "Italy"
         },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Classic Silver Ring",
-            "description": "Timeless silver ring with elegant design, suitable for any occasion and perfect as a gift. The classic styling ensures it never goes out of fashion.",
-            "price": 650.00,
-            "category": "Rings",
-            "image_url": "https://images.unsplash.com/photo-1593554466439-3c9978dd302c",
-            "model_image_url": "https://images.unsplash.com/photo-1558882257-af20d5828286",  # Model wearing the EXACT same Classic Silver Ring
-            "material_details": {
-                "material": "Sterling Silver",
-                "gemstones": "None",
-                "weight": "3.7g",
-                "origin": "Denmark"
-            },
-            "is_featured": False,
-            "created_at": datetime.utcnow()
+        "is_featured": True
+    },
+    {
+        "name": "Classic Silver Ring",
+        "description": "Timeless silver ring with elegant design, suitable for any occasion and perfect as a gift. The classic styling ensures it never goes out of fashion.",
+        "price": 650.00,
+        "category": "Rings",
+        "image_url": "https://images.unsplash.com/photo-1593554466439-3c9978dd302c",
+        "model_image_url": "https://images.unsplash.com/photo-1558882257-af20d5828286",  # Model wearing the EXACT same Classic Silver Ring
+        "material_details": {
+            "material": "Sterling Silver",
+            "gemstones": "None",
+            "weight": "3.7g",
+            "origin": "Denmark"
         },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Luxury Ring Collection",
-            "description": "Exclusive collection of premium rings with precious stones, representing the pinnacle of luxury jewelry. Each piece is a masterwork of craftsmanship.",
-            "price": 4500.00,
-            "category": "Rings",
-            "image_url": "https://images.unsplash.com/photo-1543295204-2ae345412549",
-            "model_image_url": "https://images.pexels.com/photos/16971727/pexels-photo-16971727.jpeg",  # Model wearing the EXACT same Luxury Ring Collection
-            "material_details": {
-                "material": "18k Gold",
-                "gemstones": "Sapphires & Diamonds",
-                "weight": "8.9g",
-                "origin": "Switzerland"
-            },
-            "is_featured": True,
-            "created_at": datetime.utcnow()
-        }
-    ]
+        "is_featured": False
+    },
+    {
+        "name": "Luxury Ring Collection",
+        "description": "Exclusive collection of premium rings with precious stones, representing the pinnacle of luxury jewelry. Each piece is a masterwork of craftsmanship.",
+        "price": 4500.00,
+        "category": "Rings",
+        "image_url": "https://images.unsplash.com/photo-1543295204-2ae345412549",
+        "model_image_url": "https://images.pexels.com/photos/16971727/pexels-photo-16971727.jpeg",  # Model wearing the EXACT same Luxury Ring Collection
+        "material_details": {
+            "material": "18k Gold",
+            "gemstones": "Sapphires & Diamonds",
+            "weight": "8.9g",
+            "origin": "Switzerland"
+        },
+        "is_featured": True
+    }
+]
+
+async def reconcile_sample_products(database, update: bool = False) -> dict:
+    # Missing samples are always added; edited ones are only restored with update=True,
+    # so admin changes to a sample product survive routine init-data calls
+    names = [sample["name"] for sample in SAMPLE_PRODUCTS]
+    existing = {}
+    async for product in database.products.find({"name": {"$in": names}}, {"_id": 0}):
+        existing.setdefault(product["name"], product)
+    operations, inserted, updated = [], [], []
+    for sample in SAMPLE_PRODUCTS:
+        product = existing.get(sample["name"])
+        if product is None:
+            # An upsert, so two concurrent runs cannot both insert the sample
+            operations.append(UpdateOne({"name": sample["name"]}, {"$setOnInsert": Product(**sample).dict()}, upsert=True))
+            inserted.append(sample["name"])
+            continue
+        if not update:
+            continue
+        changes = {field: value for field, value in sample.items() if product.get(field) != value}
+        if changes:
+            operations.append(UpdateOne({"id": product["id"]}, {"$set": changes, "$inc": {"version": 1}}))
+            updated.append(sample["name"])
+    if operations:
+        await database.products.bulk_write(operations, ordered=False)
+    return {"inserted": inserted, "updated": updated}
+
+@api_router.post("/init-data")
+async def init_sample_data(reconcile: bool = False):
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
     
-    await db.products.insert_many(sample_products)
-    return {"message": "Sample data initialized successfully"}
+    result = await reconcile_sample_products(db, update=reconcile)
+    changed = result["inserted"] + result["updated"]
+    if changed:
+        on_products_written(await db.products.find({"name": {"$in": changed}}, PRODUCT_INDEX_PROJECTION).to_list(None))
+    if result["inserted"]:
+        message = "Sample data initialized successfully"
+    elif result["updated"]:
+        message = "Sample data updated with new fields"
+    else:
+        message = "Sample data already exists"
+    return {"message": message, **result}
 
 # Health check
 @api_router.get("/")
@@ -387,9 +2863,393 @@ async def root():
     return {
         "message": "Premium Jewelry API is running",
         "mongodb_status": mongo_status,
-        "database": os.environ.get('DB_NAME', 'premium_jewelry')
+        "database": os.environ.get('DB_NAME', 'premium_jewelry'),
+        "product_cache": product_cache.stats(),
+        "image_fingerprints": fingerprint_store.stats(),
+        "image_duplicates": duplicate_index.stats(),
+        "image_validation": validation_workers.stats(),
+        "image_health": image_health_crawler.stats(),
+        "image_cache": image_cache.stats(),
+        "contact_writer": contact_writer.stats(),
+        "slow_queries": slow_query_log.stats()
     }
 
+# Metrics
+# Prometheus text format at /metrics. Request metrics are recorded on the event loop
+# thread, so counters are plain ints behind no locks, and a histogram observation is
+# one bisect plus one list increment into fixed buckets; cumulative bucket counts are
+# only computed when scraped. pymongo calls its monitoring listeners on driver
+# threads, so those only append to a deque (atomic under the GIL); the events are
+# folded into the histograms on the event loop, after each request and on scrape.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_EVENT_BACKLOG = 100000
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+    def samples(self, name: str, labels: str) -> list:
+        lines, total = [], 0
+        for bound, count in zip(LATENCY_BUCKETS + (math.inf,), self.counts):
+            total += count
+            le = "+Inf" if bound == math.inf else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {total}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {total}")
+        return lines
+
+def metric_labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+class Metrics:
+    def __init__(self):
+        self.requests = {}
+        self.in_flight = 0
+        self.commands = {}
+        self.pools = {}
+        # (kind, ...) tuples appended by pymongo listener threads
+        self.mongo_events = deque(maxlen=MONGO_EVENT_BACKLOG)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route, status)
+        histogram = self.requests.get(key)
+        if histogram is None:
+            histogram = self.requests[key] = Histogram()
+        histogram.observe(seconds)
+
+    def fold_mongo_events(self):
+        events = self.mongo_events
+        while events:
+            event = events.popleft()
+            if event[0] == "command":
+                _, command, collection, outcome, seconds = event
+                key = (command, collection, outcome)
+                histogram = self.commands.get(key)
+                if histogram is None:
+                    histogram = self.commands[key] = Histogram()
+                histogram.observe(seconds)
+            else:
+                _, address, field, delta = event
+                pool = self.pools.setdefault(address, {"connections": 0, "checked_out": 0, "checkout_failures": 0})
+                pool[field] += delta
+
+    def render(self, max_pool_size: Optional[int]) -> str:
+        self.fold_mongo_events()
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being handled.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Requests handled, by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        requests = sorted(self.requests.items())
+        for (method, route, status), histogram in requests:
+            lines.append(f"http_requests_total{{{metric_labels(method=method, route=route, status=status)}}} {sum(histogram.counts)}")
+        lines += [
+            "# HELP http_request_duration_seconds Request latency, by route and status.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), histogram in requests:
+            labels = metric_labels(method=method, route=route, status=status)
+            lines += histogram.samples("http_request_duration_seconds", labels)
+        lines += [
+            "# HELP mongodb_command_duration_seconds MongoDB command latency, by command, collection and outcome.",
+            "# TYPE mongodb_command_duration_seconds histogram",
+        ]
+        for (command, collection, outcome), histogram in sorted(self.commands.items()):
+            labels = metric_labels(command=command, collection=collection, outcome=outcome)
+            lines += histogram.samples("mongodb_command_duration_seconds", labels)
+        pool_metrics = (
+            ("connections", "gauge", "Open connections in the pool."),
+            ("checked_out", "gauge", "Connections currently checked out of the pool."),
+            ("checkout_failures", "counter", "Failed connection checkouts."),
+        )
+        for field, kind, description in pool_metrics:
+            name = f"mongodb_pool_{field}" + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            for address, pool in sorted(self.pools.items()):
+                lines.append(f"{name}{{{metric_labels(address=address)}}} {pool[field]}")
+        if max_pool_size is not None:
+            lines += [
+                "# HELP mongodb_pool_max_connections Configured maximum pool size per server.",
+                "# TYPE mongodb_pool_max_connections gauge",
+                f"mongodb_pool_max_connections {max_pool_size}",
+            ]
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+def pool_address(address) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        # Succeeded/failed events do not carry the command, so its collection is kept
+        self.collections = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if not isinstance(target, str):
+            target = event.command.get("collection", "")
+        self.collections[(event.connection_id, event.request_id)] = target
+
+    def succeeded(self, event):
+        self.record(event, "succeeded")
+
+    def failed(self, event):
+        self.record(event, "failed")
+
+    def record(self, event, outcome: str):
+        collection = self.collections.pop((event.connection_id, event.request_id), "")
+        metrics.mongo_events.append(("command", event.command_name, collection, outcome, event.duration_micros / 1e6))
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    def pool_created(self, event):
+        metrics.mongo_events.append(("pool", pool_address(event.address), "connections", 0))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        metrics.mongo_events.append(("pool", pool_address(event.address), "connections", 1))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        metrics.mongo_events.append(("pool", pool_address(event.address), "connections", -1))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        metrics.mongo_events.append(("pool", pool_address(event.address), "checkout_failures", 1))
+
+    def connection_checked_out(self, event):
+        metrics.mongo_events.append(("pool", pool_address(event.address), "checked_out", 1))
+
+    def connection_checked_in(self, event):
+        metrics.mongo_events.append(("pool", pool_address(event.address), "checked_out", -1))
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware, which adds a task per request and
+    # buffers streaming responses
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight -= 1
+            # The router stores the matched route in the scope; labelling by its path
+            # template keeps one series per route, whatever the ids in the URL
+            route = scope.get("route")
+            metrics.observe_request(
+                scope["method"], route.path if route is not None else "unmatched", status,
+                time.perf_counter() - started,
+            )
+            if metrics.mongo_events:
+                metrics.fold_mongo_events()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    max_pool_size = client.options.pool_options.max_pool_size if isinstance(client, AsyncIOMotorClient) else None
+    return PlainTextResponse(metrics.render(max_pool_size), media_type="text/plain; version=0.0.4")
+
+# Slow-query log
+# A command listener on the Motor client reports product and contact commands that
+# take longer than SLOW_QUERY_MS. They are grouped by query shape: the filter with
+# every value replaced by "?", so queries differing only in ids or prices share one
+# entry, and customer data from contacts never reaches the log. The first time a shape
+# is seen (and again after SLOW_QUERY_EXPLAIN_TTL) the command is explained with
+# executionStats in the background, recording the plan stages, e.g. COLLSCAN, and how
+# many documents were examined per document returned.
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_EXPLAIN_TTL = float(os.environ.get('SLOW_QUERY_EXPLAIN_TTL', '3600'))
+SLOW_QUERY_MAX_SHAPES = 500
+SLOW_QUERY_COLLECTIONS = {"products", "contacts"}
+# Commands explain supports; explaining a write does not apply it
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Session, transaction and concern fields the driver adds; explain rejects them, and
+# retryable writes carry txnNumber on every findAndModify, update and delete
+EXPLAIN_EXCLUDED_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "writeConcern", "readConcern"}
+
+def query_shape(value):
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $and/$or keep their clauses; value lists such as $in collapse
+        return [query_shape(item) for item in value if isinstance(item, dict)] or "?"
+    return "?"
+
+def command_filter(name: str, command: dict):
+    if name == "find":
+        return command.get("filter") or {}, command.get("sort")
+    if name == "findAndModify":
+        return command.get("query") or {}, command.get("sort")
+    if name == "aggregate":
+        return command.get("pipeline") or [], None
+    if name in ("count", "distinct"):
+        return command.get("query") or {}, None
+    if name in ("update", "delete"):
+        statements = command.get("updates" if name == "update" else "deletes") or [{}]
+        return statements[0].get("q") or {}, None
+    return {}, None
+
+def plan_summary(explain: dict) -> dict:
+    stages = []
+
+    def walk(plan):
+        if isinstance(plan, dict):
+            if "stage" in plan:
+                stages.append(f"{plan['stage']}({plan['indexName']})" if plan.get("indexName") else plan["stage"])
+            for item in plan.values():
+                walk(item)
+        elif isinstance(plan, list):
+            for item in plan:
+                walk(item)
+
+    walk(explain.get("queryPlanner", {}).get("winningPlan", {}))
+    stats = explain.get("executionStats", {})
+    return {
+        "stages": stages,
+        "collection_scan": "COLLSCAN" in stages,
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+class SlowQueryLog:
+    def __init__(self):
+        self.loop = None
+        self.entries = OrderedDict()
+        self.explaining = set()
+        self.recorded = 0
+
+    def record(self, database: str, name: str, collection: str, command: dict, seconds: float):
+        query, sort = command_filter(name, command)
+        shape = {"filter": query_shape(query), "sort": dict(sort) if sort else None}
+        key = hashlib.sha1(json.dumps([collection, name, shape], sort_keys=True).encode()).hexdigest()[:16]
+        now = datetime.utcnow()
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            entry = {
+                "shape_id": key, "collection": collection, "command": name, **shape,
+                "count": 0, "total_ms": 0.0, "max_ms": 0.0, "first_seen": now, "plan": None, "explained_at": None,
+            }
+        self.entries[key] = entry
+        while len(self.entries) > SLOW_QUERY_MAX_SHAPES:
+            self.entries.popitem(last=False)
+        milliseconds = seconds * 1000
+        entry["count"] += 1
+        entry["total_ms"] = round(entry["total_ms"] + milliseconds, 1)
+        entry["max_ms"] = round(max(entry["max_ms"], milliseconds), 1)
+        entry["last_seen"] = now
+        self.recorded += 1
+        logger.warning(
+            f"Slow {name} on {collection} ({milliseconds:.0f} ms): filter {json.dumps(shape['filter'])}, "
+            f"sort {json.dumps(shape['sort'])}, shape {key}"
+        )
+        stale = entry["explained_at"] is None or (now - entry["explained_at"]).total_seconds() > SLOW_QUERY_EXPLAIN_TTL
+        if name in EXPLAINABLE_COMMANDS and stale and key not in self.explaining:
+            self.explaining.add(key)
+            asyncio.create_task(self.explain(key, database, command))
+
+    async def explain(self, key: str, database: str, command: dict):
+        explained = {
+            field: value for field, value in command.items()
+            if not field.startswith("$") and field not in EXPLAIN_EXCLUDED_FIELDS
+        }
+        try:
+            result = await client[database].command({"explain": explained, "verbosity": "executionStats"})
+            plan = plan_summary(result)
+        except Exception as e:
+            logger.warning(f"Could not explain slow query {key}: {e}")
+            plan = {"error": str(e)}
+        finally:
+            self.explaining.discard(key)
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry["plan"] = plan
+        entry["explained_at"] = datetime.utcnow()
+        if "error" not in plan:
+            logger.warning(
+                f"Slow query {key} on {entry['collection']} plan {' > '.join(plan['stages'])}: "
+                f"{plan['docs_examined']} documents examined for {plan['returned']} returned"
+            )
+
+    def stats(self) -> dict:
+        return {"threshold_ms": SLOW_QUERY_MS, "shapes": len(self.entries), "recorded": self.recorded}
+
+slow_query_log = SlowQueryLog()
+
+class SlowQueryListener(monitoring.CommandListener):
+    # Called on driver threads: commands are held only until they finish, and slow
+    # ones are handed to the event loop, where the log lives
+    def __init__(self):
+        self.commands = {}
+
+    def started(self, event):
+        if SLOW_QUERY_MS <= 0:
+            return
+        target = event.command.get(event.command_name)
+        if isinstance(target, str) and target in SLOW_QUERY_COLLECTIONS:
+            self.commands[(event.connection_id, event.request_id)] = (event.database_name, target, event.command)
+
+    def succeeded(self, event):
+        self.finish(event)
+
+    def failed(self, event):
+        self.finish(event)
+
+    def finish(self, event):
+        started = self.commands.pop((event.connection_id, event.request_id), None)
+        if started is None or event.duration_micros < SLOW_QUERY_MS * 1000:
+            return
+        loop = slow_query_log.loop
+        if loop is not None and not loop.is_closed():
+            database, collection, command = started
+            loop.call_soon_threadsafe(
+                slow_query_log.record, database, event.command_name, collection, command, event.duration_micros / 1e6
+            )
+
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(limit: int = Query(50, ge=1, le=SLOW_QUERY_MAX_SHAPES)):
+    entries = sorted(slow_query_log.entries.values(), key=lambda entry: entry["total_ms"], reverse=True)
+    return {**slow_query_log.stats(), "queries": entries[:limit]}
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -399,7 +3259,11 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Next-Offset", "ETag", "X-Duplicate-Of", "Server-Timing"],
 )
+app.add_middleware(ServerTimingMiddleware)
+# Outermost, so time spent in the other middleware is included
+app.add_middleware(MetricsMiddleware)
 
 # Configure logging
 logging.basicConfig(
@@ -408,18 +3272,226 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Indexes every query in this module relies on, reconciled at startup. Every product
+# write maintains all of them, so listings only get a compound index where a filter
+# is selective and common; other filters (validation_status, which nearly every
+# product passes, or is_featured with a non-default sort) are applied to the
+# sort-field index as it is walked.
+INDEXES = {
+    "products": [([("id", 1)], {"unique": True})] + [
+        ([(field, 1), ("id", 1)], {}) for field in PRODUCT_SORT_FIELDS
+    ] + [
+        # Storefront collection pages and featured row, then price within a category
+        ([("category", 1), ("created_at", 1), ("id", 1)], {}),
+        ([("is_featured", 1), ("created_at", 1), ("id", 1)], {}),
+        ([("category", 1), ("price", 1), ("id", 1)], {}),
+    ] + [
+        # The image health crawler updates products by image URL
+        ([(kind, 1)], {}) for kind in PRODUCT_IMAGE_KINDS
+    ],
+    "contacts": [
+        ([("created_at", 1)], {}),
+    ],
+    "image_fingerprints": [
+        ([("url", 1)], {"unique": True}),
+        ([("digest", 1)], {}),
+    ],
+    "validation_jobs": [
+        ([("id", 1)], {"unique": True}),
+        ([("status", 1), ("run_at", 1)], {}),
+        ([("status", 1), ("lease_until", 1)], {}),
+    ],
+}
+
+async def ensure_indexes(database):
+    created = []
+    for collection_name, indexes in INDEXES.items():
+        collection = database[collection_name]
+        # Keys are compared as stored: 1 and 1.0 hash alike, and text, 2dsphere or
+        # hashed specs simply never match ours
+        existing = {
+            tuple((field, direction) for field, direction in info["key"]): info
+            for info in (await collection.index_information()).values()
+        }
+        for keys, options in indexes:
+            key = tuple(keys)
+            if key in existing:
+                if options.get("unique", False) != existing[key].get("unique", False):
+                    raise RuntimeError(
+                        f"Index {collection_name}{list(key)} exists with a different unique option; "
+                        "drop it so it can be recreated"
+                    )
+                continue
+            try:
+                name = await collection.create_index(keys, **options)
+            except OperationFailure as e:
+                raise RuntimeError(f"Could not create index {collection_name}{keys}: {e}") from e
+            created.append(f"{collection_name}.{name}")
+    if created:
+        logger.info(f"Created indexes: {', '.join(created)}")
+    else:
+        logger.info("All indexes already present")
+    return created
+
+# One-off data migrations, each recorded in the migrations collection once applied so
+# later boots skip it; running one twice concurrently must be harmless
+async def migrate_product_versions(database):
+    # Products written before versioning start at version 1
+    if await database.migrations.find_one({"_id": "product_versions"}) is not None:
+        return
+    result = await database.products.update_many({"version": {"$exists": False}}, {"$set": {"version": 1}})
+    await database.migrations.update_one(
+        {"_id": "product_versions"},
+        {"$set": {"applied_at": datetime.utcnow(), "modified": result.modified_count}},
+        upsert=True,
+    )
+    logger.info(f"Migrated {result.modified_count} products to versioned writes")
+
+# Cross-worker cache coherence
+# Every worker tails the products change stream so a write handled by another worker
+# invalidates its local state too. Change streams need a replica set; on a standalone
+# mongod the watcher stops with a warning: the cache TTL then bounds staleness and the
+# search index only reflects this worker's own writes.
+CHANGE_STREAM_UNSUPPORTED = {40573}
+CHANGE_STREAM_HISTORY_LOST = {136, 280, 286}
+change_stream_task = None
+
+# Events already buffered by the driver are applied together, so a bulk import on
+# another worker is indexed in one pass rather than product by product
+CHANGE_BATCH_SIZE = 1000
+
+# Crawler results live under image_health, which no cache, index or listing reads.
+# Updates that only set those fields are dropped by the stream itself, so a crawl
+# pass does not send a full catalog's worth of documents to every worker, and
+# apply_product_changes skips them too rather than invalidating everything.
+CRAWLER_ONLY_FIELD = "image_health"
+PRODUCT_CHANGE_PIPELINE = [{"$match": {"$expr": {"$not": [{"$and": [
+    {"$eq": ["$operationType", "update"]},
+    {"$eq": [{"$size": {"$ifNull": ["$updateDescription.removedFields", []]}}, 0]},
+    {"$allElementsTrue": [{"$map": {
+        "input": {"$objectToArray": {"$ifNull": ["$updateDescription.updatedFields", {}]}},
+        "in": {"$regexMatch": {"input": "$$this.k", "regex": f"^{CRAWLER_ONLY_FIELD}(\\.|$)"}},
+    }}]},
+]}]}}}]
+
+def crawler_only_update(change: dict) -> bool:
+    if change["operationType"] != "update":
+        return False
+    description = change.get("updateDescription") or {}
+    if description.get("removedFields"):
+        return False
+    return all(
+        field == CRAWLER_ONLY_FIELD or field.startswith(CRAWLER_ONLY_FIELD + ".")
+        for field in description.get("updatedFields") or {}
+    )
+
+async def apply_product_changes(changes: list):
+    written = []
+    for change in changes:
+        operation = change["operationType"]
+        if crawler_only_update(change):
+            continue
+        if operation in ("insert", "replace", "update"):
+            product = change.get("fullDocument")
+            if product is not None:
+                written.append(product)
+            else:
+                # Deleted again before the update lookup ran; the delete event follows
+                product_cache.invalidate()
+        elif operation == "delete":
+            on_products_written(written)
+            written = []
+            product_id = search_index.object_ids.get(str(change["documentKey"]["_id"]))
+            if product_id is not None:
+                on_product_deleted(product_id)
+            else:
+                product_cache.invalidate()
+        else:
+            # drop, rename, invalidate: the collection itself changed
+            written = []
+            await rebuild_product_state()
+    on_products_written(written)
+
+async def watch_product_changes():
+    resume_token = None
+    retry_delay = 1
+    resync = False
+    while True:
+        try:
+            async with db.products.watch(
+                PRODUCT_CHANGE_PIPELINE, full_document="updateLookup", resume_after=resume_token, max_await_time_ms=200
+            ) as stream:
+                # Without a resume token, writes made while the stream was down were missed
+                if resync:
+                    await rebuild_product_state()
+                retry_delay = 1
+                logger.info("Watching products change stream")
+                batch = []
+                while stream.alive:
+                    change = await stream.try_next()
+                    if change is not None:
+                        batch.append(change)
+                        if len(batch) < CHANGE_BATCH_SIZE and stream.alive:
+                            continue
+                    if batch:
+                        await apply_product_changes(batch)
+                        batch = []
+                    # Only advance once the batch is applied; an invalidate event ends
+                    # the stream and cannot be resumed from
+                    resume_token = stream.resume_token if stream.alive else None
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED:
+                logger.warning(f"Change streams unavailable, relying on cache TTL: {e}")
+                return
+            if e.code in CHANGE_STREAM_HISTORY_LOST:
+                resume_token = None
+            logger.warning(f"Products change stream failed, retrying in {retry_delay}s: {e}")
+        except Exception as e:
+            logger.warning(f"Products change stream failed, retrying in {retry_delay}s: {e}")
+        resync = resume_token is None
+        await asyncio.sleep(retry_delay)
+        retry_delay = min(retry_delay * 2, 30)
+
 @app.on_event("startup")
 async def startup_db_client():
-    global client, db
+    global client, db, change_stream_task, image_health_task
+    slow_query_log.loop = asyncio.get_running_loop()
     try:
         client, db = await connect_to_mongo()
         logger.info("Database connection established successfully")
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
         # Don't exit, let the app start but with db = None
+        return
+    # An index that cannot be built (e.g. duplicate product ids) must stop the app
+    await ensure_indexes(db)
+    await migrate_product_versions(db)
+    await rebuild_product_state()
+    change_stream_task = asyncio.create_task(watch_product_changes())
+    if IMAGE_VALIDATION_ASYNC:
+        validation_workers.start()
+    if IMAGE_HEALTH_INTERVAL > 0:
+        image_health_task = asyncio.create_task(image_health_crawler.run_schedule())
+    if CONTACT_WRITE_BEHIND:
+        contact_writer.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if change_stream_task:
+        change_stream_task.cancel()
+    # Jobs still running are picked up again once their lease expires
+    await validation_workers.stop()
+    if image_health_task:
+        image_health_task.cancel()
+    await image_health_crawler.stop()
+    if image_backfill_task:
+        image_backfill_task.cancel()
+    # Queued contacts must reach MongoDB before the client closes
+    await contact_writer.stop()
+    if http_client:
+        await http_client.aclose()
     if client:
         client.close()
         logger.info("Database connection closed")
\ No newline at end of file
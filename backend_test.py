@@ -5,6 +5,17 @@ import unittest
 import os
 import sys
 import uuid
+import hashlib
+import base64
+import time
+import csv
+import io
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 from dotenv import load_dotenv
 
 # Load the backend URL from the frontend .env file
@@ -606,6 +617,880 @@ class PremiumJewelryAPITest(unittest.TestCase):
         
         print("✅ Sample data initialization with model images successful")
 
+    def test_16_paginate_products(self):
+        """Test keyset pagination of the product listing"""
+        print("\n=== Testing Product Pagination ===")
+        requests.post(f"{self.api_url}/init-data")
+        
+        # Walk the catalog two products at a time following the cursor header
+        seen_ids = []
+        params = {"limit": 2}
+        while True:
+            response = requests.get(f"{self.api_url}/products", params=params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page), 2)
+            seen_ids.extend(p["id"] for p in page)
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            params = {"limit": 2, "cursor": next_cursor}
+        
+        # Every product is returned exactly once
+        self.assertEqual(len(seen_ids), len(set(seen_ids)))
+        response = requests.get(f"{self.api_url}/products", params={"limit": 1000})
+        self.assertEqual(len(seen_ids), len(response.json()))
+        
+        # A malformed cursor is rejected
+        response = requests.get(f"{self.api_url}/products", params={"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+        # A cursor only continues the sort that produced it
+        response = requests.get(f"{self.api_url}/products", params={"limit": 1, "sort": "price"})
+        cursor = response.headers["X-Next-Cursor"]
+        response = requests.get(f"{self.api_url}/products", params={"limit": 1, "sort": "-price", "cursor": cursor})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("sort 'price'", response.json()["detail"])
+
+        # Query operators smuggled into a cursor are rejected, not passed to Mongo
+        for payload in (["price", {"$ne": None}, "x"], ["name", "Ring", {"$regex": "."}]):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+            response = requests.get(f"{self.api_url}/products", params={"sort": payload[0], "cursor": cursor})
+            self.assertEqual(response.status_code, 400)
+        
+        print(f"✅ Paginated through {len(seen_ids)} products")
+
+    def test_17_product_cache_invalidation(self):
+        """Test that cached product reads reflect writes immediately"""
+        print("\n=== Testing Product Cache Invalidation ===")
+        response = requests.post(f"{self.api_url}/products", json=self.test_product)
+        self.assertEqual(response.status_code, 200)
+        product_id = response.json()["id"]
+        self.created_product_id = product_id
+        
+        # Warm the cache, then update and read again
+        requests.get(f"{self.api_url}/products/{product_id}")
+        requests.get(f"{self.api_url}/products/{product_id}")
+        response = requests.put(f"{self.api_url}/products/{product_id}", json={"price": 1234.5})
+        self.assertEqual(response.status_code, 200)
+        response = requests.get(f"{self.api_url}/products/{product_id}")
+        self.assertEqual(response.json()["price"], 1234.5)
+        
+        # Cache counters are reported on the health endpoint
+        stats = requests.get(f"{self.api_url}/").json()["product_cache"]
+        for field in ["hits", "misses", "size", "max_size", "ttl_seconds"]:
+            self.assertIn(field, stats)
+        
+        print("✅ Product cache invalidation successful")
+
+    def test_18_filter_and_sort_products(self):
+        """Test server-side filtering and sorting of products"""
+        print("\n=== Testing Product Filtering and Sorting ===")
+        requests.post(f"{self.api_url}/init-data")
+        
+        response = requests.get(f"{self.api_url}/products", params={"category": "Rings", "sort": "-price"})
+        self.assertEqual(response.status_code, 200)
+        products = response.json()
+        self.assertGreater(len(products), 0)
+        for product in products:
+            self.assertEqual(product["category"], "Rings")
+        prices = [p["price"] for p in products]
+        self.assertEqual(prices, sorted(prices, reverse=True))
+        
+        response = requests.get(f"{self.api_url}/products", params={"min_price": 1000, "max_price": 3000})
+        self.assertEqual(response.status_code, 200)
+        for product in response.json():
+            self.assertTrue(1000 <= product["price"] <= 3000)
+        
+        # Sorting on an unindexed field is rejected
+        response = requests.get(f"{self.api_url}/products", params={"sort": "description"})
+        self.assertEqual(response.status_code, 400)
+        
+        response = requests.get(f"{self.api_url}/products/categories")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Rings", response.json())
+        
+        print("✅ Product filtering and sorting successful")
+
+    def test_19_search_products(self):
+        """Test full-text product search"""
+        print("\n=== Testing Product Search ===")
+        requests.post(f"{self.api_url}/init-data")
+        
+        response = requests.get(f"{self.api_url}/products/search", params={"q": "sapphire"})
+        self.assertEqual(response.status_code, 200)
+        names = [p["name"] for p in response.json()]
+        self.assertIn("Luxury Ring Collection", names)
+        
+        # Multi-word queries match products containing every term
+        response = requests.get(f"{self.api_url}/products/search", params={"q": "white gold"})
+        self.assertEqual(response.status_code, 200)
+        for product in response.json():
+            text = f"{product['name']} {product['description']} {product['material_details']}".lower()
+            self.assertIn("white", text)
+            self.assertIn("gold", text)
+        
+        # Newly created products are searchable immediately
+        response = requests.post(f"{self.api_url}/products", json=self.test_product)
+        self.created_product_id = response.json()["id"]
+        response = requests.get(f"{self.api_url}/products/search", params={"q": "bracelet"})
+        self.assertIn(self.created_product_id, [p["id"] for p in response.json()])
+        
+        print("✅ Product search successful")
+
+    def test_20_suggest_products(self):
+        """Test typeahead suggestions"""
+        print("\n=== Testing Product Suggestions ===")
+        requests.post(f"{self.api_url}/init-data")
+        
+        response = requests.get(f"{self.api_url}/products/suggest", params={"q": "wh"})
+        self.assertEqual(response.status_code, 200)
+        suggestions = response.json()
+        self.assertIn("18k White Gold", [s["text"] for s in suggestions])
+        for suggestion in suggestions:
+            self.assertIn("kind", suggestion)
+        
+        # Suggestions match the start of any word, not just the phrase
+        response = requests.get(f"{self.api_url}/products/suggest", params={"q": "eternity"})
+        self.assertIn("Diamond Eternity Ring", [s["text"] for s in response.json()])
+        
+        response = requests.get(f"{self.api_url}/products/suggest", params={"q": "zzzz"})
+        self.assertEqual(response.json(), [])
+        
+        print("✅ Product suggestions successful")
+
+    def test_21_sparse_fieldsets(self):
+        """Test fields= projection on product reads"""
+        print("\n=== Testing Sparse Fieldsets ===")
+        requests.post(f"{self.api_url}/init-data")
+        listing_fields = ["id", "name", "price", "image_url", "model_image_url"]
+        
+        response = requests.get(f"{self.api_url}/products", params={"fields": ",".join(listing_fields)})
+        self.assertEqual(response.status_code, 200)
+        products = response.json()
+        self.assertGreater(len(products), 0)
+        for product in products:
+            self.assertEqual(sorted(product.keys()), sorted(listing_fields))
+        
+        # id is always returned
+        product_id = products[0]["id"]
+        response = requests.get(f"{self.api_url}/products/{product_id}", params={"fields": "name"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json().keys()), ["id", "name"])
+        
+        response = requests.get(f"{self.api_url}/products", params={"fields": "id,not_a_field"})
+        self.assertEqual(response.status_code, 400)
+        
+        print("✅ Sparse fieldsets successful")
+
+    def test_22_conditional_product_reads(self):
+        """Test ETag / If-None-Match handling on product reads"""
+        print("\n=== Testing Conditional Product Reads ===")
+        response = requests.post(f"{self.api_url}/products", json=self.test_product)
+        product_id = response.json()["id"]
+        self.created_product_id = product_id
+        
+        response = requests.get(f"{self.api_url}/products/{product_id}")
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers.get("ETag")
+        self.assertIsNotNone(etag)
+        self.assertIn("Cache-Control", response.headers)
+        
+        # Unchanged product answers 304 with no body
+        response = requests.get(f"{self.api_url}/products/{product_id}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        
+        # A write changes the ETag
+        requests.put(f"{self.api_url}/products/{product_id}", json={"price": 1500.0})
+        response = requests.get(f"{self.api_url}/products/{product_id}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers.get("ETag"), etag)
+        
+        response = requests.get(f"{self.api_url}/products")
+        etag = response.headers.get("ETag")
+        response = requests.get(f"{self.api_url}/products", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        
+        print("✅ Conditional product reads successful")
+
+    def test_23_bulk_products(self):
+        """Test bulk create/update/delete"""
+        print("\n=== Testing Bulk Product Writes ===")
+        items = [
+            {"op": "create", "product": dict(self.test_product, name=f"Bulk Bracelet {i}")}
+            for i in range(3)
+        ]
+        response = requests.post(f"{self.api_url}/products/bulk", json=items)
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result["created"], 3)
+        created_ids = [item["id"] for item in result["items"]]
+        
+        # Mixed batch sent as NDJSON, with one invalid item
+        batch = [
+            {"op": "update", "id": created_ids[0], "product": {"price": 10.0}},
+            {"op": "delete", "id": created_ids[1]},
+            {"op": "delete", "id": created_ids[2]},
+            {"op": "delete", "id": str(uuid.uuid4())},
+            {"op": "create", "product": {"name": "Incomplete"}},
+        ]
+        response = requests.post(
+            f"{self.api_url}/products/bulk",
+            data="\n".join(json.dumps(item) for item in batch),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual((result["updated"], result["deleted"], result["failed"]), (1, 2, 2))
+        statuses = [item["status"] for item in result["items"]]
+        self.assertEqual(statuses, [200, 200, 200, 404, 422])
+        
+        response = requests.get(f"{self.api_url}/products/{created_ids[0]}")
+        self.assertEqual(response.json()["price"], 10.0)
+        self.created_product_id = created_ids[0]
+        
+        print("✅ Bulk product writes successful")
+
+    def test_24_duplicate_images(self):
+        """Test near-duplicate image detection"""
+        print("\n=== Testing Duplicate Image Detection ===")
+        first = requests.post(f"{self.api_url}/products", json=self.test_product)
+        self.assertEqual(first.status_code, 200)
+        first_id = first.json()["id"]
+        time.sleep(1)
+
+        second = requests.post(f"{self.api_url}/products", json=dict(self.test_product, name="Copied Bracelet"))
+        second_id = second.json()["id"] if second.status_code == 200 else None
+        try:
+            if second.status_code == 409:
+                self.assertIn(first_id, second.json()["detail"])
+            else:
+                self.assertEqual(second.status_code, 200)
+
+            response = requests.get(f"{self.api_url}/admin/images/duplicates")
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertIn("clusters", data)
+            # Only images the server could fingerprint are indexed
+            if second.headers.get("X-Duplicate-Of"):
+                self.assertIn(first_id, second.headers["X-Duplicate-Of"].split(","))
+                self.assertTrue(any(
+                    {first_id, second_id} <= set(cluster["product_ids"]) for cluster in data["clusters"]
+                ))
+
+            response = requests.get(f"{self.api_url}/admin/images/duplicates", params={"max_distance": 99})
+            self.assertEqual(response.status_code, 422)
+        finally:
+            requests.delete(f"{self.api_url}/products/{first_id}")
+            if second_id:
+                requests.delete(f"{self.api_url}/products/{second_id}")
+
+        print("✅ Duplicate image detection successful")
+
+    def test_25_validation_status(self):
+        """Test product validation status and filtering"""
+        print("\n=== Testing Product Validation Status ===")
+        response = requests.post(f"{self.api_url}/products", json=self.test_product)
+        self.assertIn(response.status_code, (200, 202))
+        product = response.json()
+        self.created_product_id = product["id"]
+        if response.status_code == 200:
+            self.assertEqual(product["validation_status"], "validated")
+        else:
+            # Accepted for background validation
+            self.assertEqual(product["validation_status"], "pending")
+            for _ in range(30):
+                time.sleep(1)
+                product = requests.get(f"{self.api_url}/products/{product['id']}").json()
+                if product["validation_status"] != "pending":
+                    break
+            self.assertIn(product["validation_status"], ("validated", "rejected"))
+
+        status = product["validation_status"]
+        response = requests.get(f"{self.api_url}/products", params={"validation_status": status, "limit": 1000})
+        self.assertEqual(response.status_code, 200)
+        products = response.json()
+        self.assertTrue(all(item["validation_status"] == status for item in products))
+        self.assertIn(product["id"], [item["id"] for item in products])
+
+        response = requests.get(f"{self.api_url}/products", params={"validation_status": "unknown"})
+        self.assertEqual(response.status_code, 422)
+
+        print("✅ Product validation status successful")
+
+    def test_26_image_health_crawl(self):
+        """Test the catalog image health crawler"""
+        print("\n=== Testing Image Health Crawl ===")
+        response = requests.post(f"{self.api_url}/admin/images/health/crawl")
+        self.assertEqual(response.status_code, 202)
+        self.assertIn("started", response.json())
+
+        for _ in range(120):
+            response = requests.get(f"{self.api_url}/admin/images/health")
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            if not data["crawler"]["running"]:
+                break
+            time.sleep(1)
+        self.assertFalse(data["crawler"]["running"])
+        self.assertIsNotNone(data["last_run"])
+        self.assertIn("finished_at", data["last_run"])
+        for product in data["products"]:
+            statuses = [health["status"] for health in product["image_health"].values()]
+            self.assertIn("broken", statuses)
+
+        response = requests.get(f"{self.api_url}/admin/images/health", params={"status": "missing"})
+        self.assertEqual(response.status_code, 422)
+
+        print("✅ Image health crawl successful")
+
+    def test_27_resized_product_images(self):
+        """Test the product image resizing proxy"""
+        print("\n=== Testing Resized Product Images ===")
+        products = requests.get(f"{self.api_url}/products", params={"limit": 1}).json()
+        self.assertGreater(len(products), 0, "No products found, sample data may not be initialized")
+        url = f"{self.api_url}/images/{products[0]['id']}/image"
+
+        response = requests.get(url, params={"w": 300, "fmt": "jpeg"})
+        if response.status_code == 502:
+            self.skipTest(f"Original image not reachable: {response.json()['detail']}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "image/jpeg")
+        self.assertIn("max-age", response.headers["Cache-Control"])
+        self.assertTrue(response.content.startswith(b"\xff\xd8"))
+
+        response = requests.get(url, params={"w": 300}, headers={"Accept": "image/webp"})
+        self.assertEqual(response.headers["Content-Type"], "image/webp")
+        etag = response.headers["ETag"]
+        response = requests.get(url, params={"w": 300}, headers={"Accept": "image/webp", "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        response = requests.get(f"{self.api_url}/images/{uuid.uuid4()}/image")
+        self.assertEqual(response.status_code, 404)
+        response = requests.get(f"{self.api_url}/images/{products[0]['id']}/thumbnail")
+        self.assertEqual(response.status_code, 422)
+
+        print("✅ Resized product images successful")
+
+    def test_28_contact_burst(self):
+        """Test a burst of concurrent contact submissions"""
+        print("\n=== Testing Contact Submission Burst ===")
+        def submit(i):
+            return requests.post(f"{self.api_url}/contact", json=dict(self.test_contact, message=f"Burst {i}"))
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            responses = list(executor.map(submit, range(100)))
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        contacts = [response.json() for response in responses]
+        self.assertEqual(len({contact["id"] for contact in contacts}), 100)
+        self.assertEqual(sorted(contact["message"] for contact in contacts), sorted(f"Burst {i}" for i in range(100)))
+
+        # Queued submissions are written within the flush window
+        time.sleep(1)
+        stats = requests.get(f"{self.api_url}/").json()["contact_writer"]
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(stats["dropped"], 0)
+
+        print("✅ Contact submission burst successful")
+
+    def test_29_export_contacts(self):
+        """Test streaming contact export"""
+        print("\n=== Testing Contact Export ===")
+        contact = requests.post(f"{self.api_url}/contact", json=self.test_contact).json()
+        formula = requests.post(
+            f"{self.api_url}/contact", json=dict(
+                self.test_contact, name="\t=HYPERLINK(A1)", phone="+44 (20) 7946-0958", message="+SUM(A1:A9)"
+            ),
+        ).json()
+        time.sleep(1)
+        since = (datetime.utcnow() - timedelta(days=1)).isoformat()
+
+        response = requests.get(f"{self.api_url}/contacts/export", params={"since": since})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("application/x-ndjson"))
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        self.assertIn(contact["id"], [row["id"] for row in rows])
+        self.assertEqual(rows, sorted(rows, key=lambda row: row["created_at"]))
+
+        response = requests.get(f"{self.api_url}/contacts/export", params={"format": "csv", "since": since})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("attachment", response.headers["Content-Disposition"])
+        rows = list(csv.reader(io.StringIO(response.text)))
+        self.assertEqual(rows[0], ["id", "name", "email", "phone", "message", "created_at"])
+        by_id = {row[0]: row for row in rows[1:]}
+        self.assertEqual(by_id[contact["id"]][3], "+1234567890")
+        # Phone numbers are exported as entered, while formulas are neutralised
+        self.assertEqual(by_id[formula["id"]][3], "+44 (20) 7946-0958")
+        self.assertEqual(by_id[formula["id"]][1], "'\t=HYPERLINK(A1)")
+        self.assertEqual(by_id[formula["id"]][4], "'+SUM(A1:A9)")
+
+        # Nothing was created before the epoch
+        response = requests.get(f"{self.api_url}/contacts/export", params={"until": "1970-01-01T00:00:00"})
+        self.assertEqual(response.text, "")
+
+        print("✅ Contact export successful")
+
+    def test_30_versioned_product_writes(self):
+        """Test optimistic concurrency on product updates and deletes"""
+        print("\n=== Testing Versioned Product Writes ===")
+        response = requests.post(f"{self.api_url}/products", json=self.test_product)
+        self.assertIn(response.status_code, (200, 202))
+        product = response.json()
+        self.created_product_id = product["id"]
+        self.assertEqual(product["version"], 1)
+        url = f"{self.api_url}/products/{product['id']}"
+        etag = requests.get(url).headers["ETag"]
+
+        response = requests.put(url, json={"price": 1500.0}, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 2)
+        new_etag = response.headers["ETag"]
+        self.assertNotEqual(new_etag, etag)
+
+        # A second edit based on the old version is rejected instead of lost
+        response = requests.put(url, json={"price": 1200.0}, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(requests.get(url).json()["price"], 1500.0)
+
+        response = requests.delete(url, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, 409)
+        response = requests.delete(url, headers={"If-Match": new_etag})
+        self.assertEqual(response.status_code, 200)
+        self.created_product_id = None
+        self.assertEqual(requests.get(url).status_code, 404)
+
+        print("✅ Versioned product writes successful")
+
+    def test_31_product_serialization(self):
+        """Test that fast-path responses keep the full Product shape"""
+        print("\n=== Testing Product Serialization ===")
+        response = requests.get(f"{self.api_url}/products", params={"limit": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "application/json")
+        products = response.json()
+        self.assertTrue(len(products) > 0)
+        expected_fields = set(self.test_product) | {"id", "created_at", "version", "validation_status"}
+        for product in products:
+            self.assertTrue(expected_fields.issubset(product))
+            self.assertNotIn("_id", product)
+            datetime.fromisoformat(product["created_at"])
+
+        response = requests.get(f"{self.api_url}/products/{products[0]['id']}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), products[0])
+
+        response = requests.get(f"{self.api_url}/contacts")
+        self.assertEqual(response.status_code, 200)
+        for contact in response.json():
+            self.assertEqual(set(contact), {"id", "name", "email", "phone", "message", "created_at"})
+
+        print("✅ Product serialization successful")
+
+    def test_32_reconcile_sample_data(self):
+        """Test that init-data keeps edited samples unless asked to reconcile them"""
+        print("\n=== Testing Sample Data Reconciliation ===")
+        requests.post(f"{self.api_url}/init-data")
+        response = requests.post(f"{self.api_url}/products", json=self.test_product)
+        self.assertIn(response.status_code, (200, 202))
+        self.created_product_id = response.json()["id"]
+
+        products = requests.get(f"{self.api_url}/products", params={"limit": 1000}).json()
+        sample = next(p for p in products if p["name"] == "Classic Silver Ring")
+        url = f"{self.api_url}/products/{sample['id']}"
+        requests.put(url, json={"price": sample["price"] + 1})
+
+        # A plain call, as made by the storefront, keeps the admin's edit
+        response = requests.post(f"{self.api_url}/init-data")
+        self.assertEqual(response.json()["message"], "Sample data already exists")
+        self.assertEqual(requests.get(url).json()["price"], sample["price"] + 1)
+
+        response = requests.post(f"{self.api_url}/init-data", params={"reconcile": "true"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["message"], "Sample data updated with new fields")
+        self.assertEqual(data["updated"], ["Classic Silver Ring"])
+        self.assertEqual(requests.get(url).json()["price"], sample["price"])
+        # Products that are not samples survive
+        self.assertEqual(requests.get(f"{self.api_url}/products/{self.created_product_id}").status_code, 200)
+
+        response = requests.post(f"{self.api_url}/init-data", params={"reconcile": "true"})
+        self.assertEqual(response.json()["message"], "Sample data already exists")
+
+        print("✅ Sample data reconciliation successful")
+
+    def test_33_metrics(self):
+        """Test Prometheus metrics for routes and MongoDB commands"""
+        print("\n=== Testing Metrics ===")
+        products = requests.get(f"{self.api_url}/products").json()
+        requests.get(f"{self.api_url}/products/{products[0]['id']}")
+        response = requests.get(f"{BACKEND_URL}/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+        text = response.text
+        self.assertIn('http_requests_total{method="GET",route="/api/products",status="200"}', text)
+        # Ids in the URL are not labels; the route template is
+        self.assertIn('route="/api/products/{product_id}"', text)
+        self.assertNotIn(products[0]["id"], text)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/api/products",status="200",le="+Inf"}', text)
+        self.assertIn("http_requests_in_flight", text)
+        self.assertIn('mongodb_command_duration_seconds_count{command="find",collection="products",outcome="succeeded"}', text)
+        self.assertIn("mongodb_pool_connections", text)
+        print("✅ Metrics successful")
+
+    def test_34_server_timing(self):
+        """Test the Server-Timing breakdown on product responses"""
+        print("\n=== Testing Server-Timing ===")
+        products = requests.get(f"{self.api_url}/products", params={"category": "Rings", "limit": 3}).json()
+        response = requests.get(f"{self.api_url}/products/{products[0]['id']}", params={"fields": "name"})
+        self.assertEqual(response.status_code, 200)
+        timing = response.headers.get("Server-Timing")
+        self.assertIsNotNone(timing)
+        phases = dict(entry.strip().split(";dur=") for entry in timing.split(","))
+        self.assertIn("total", phases)
+        for name, duration in phases.items():
+            self.assertGreaterEqual(float(duration), 0)
+        self.assertLessEqual(float(phases.get("db", 0)), float(phases["total"]))
+        print("✅ Server-Timing successful")
+
+    def test_35_slow_queries(self):
+        """Test the slow-query report"""
+        print("\n=== Testing Slow Query Report ===")
+        response = requests.get(f"{self.api_url}/admin/slow-queries", params={"limit": 10})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn("threshold_ms", data)
+        self.assertLessEqual(len(data["queries"]), 10)
+        for query in data["queries"]:
+            self.assertIn(query["collection"], ("products", "contacts"))
+            # Shapes never carry the queried values
+            self.assertNotIn("@", json.dumps(query["filter"]))
+            self.assertGreaterEqual(query["total_ms"], query["max_ms"])
+        totals = [query["total_ms"] for query in data["queries"]]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+        print("✅ Slow query report successful")
+
+    def test_36_suggest_repeated_words(self):
+        """Test renaming and deleting a product whose name repeats a word"""
+        print("\n=== Testing Suggestions for Repeated Words ===")
+        # "gold" is both a key of its own and the start of "gold ring in 18k gold"
+        product = dict(self.test_product, name=f"Gold Ring in 18k Gold {uuid.uuid4().hex[:6]} Gold")
+        response = requests.post(f"{self.api_url}/products", json=product)
+        self.assertIn(response.status_code, (200, 202))
+        self.created_product_id = response.json()["id"]
+
+        response = requests.get(f"{self.api_url}/products/suggest", params={"q": "gold ring in"})
+        self.assertIn(product["name"], [s["text"] for s in response.json()])
+
+        renamed = f"Gold Band of Gold {uuid.uuid4().hex[:6]}"
+        response = requests.put(f"{self.api_url}/products/{self.created_product_id}", json={"name": renamed})
+        self.assertEqual(response.status_code, 200)
+        texts = [s["text"] for s in requests.get(f"{self.api_url}/products/suggest", params={"q": "gold band of"}).json()]
+        self.assertIn(renamed, texts)
+        texts = [s["text"] for s in requests.get(f"{self.api_url}/products/suggest", params={"q": "gold ring in"}).json()]
+        self.assertNotIn(product["name"], texts)
+
+        response = requests.delete(f"{self.api_url}/products/{self.created_product_id}")
+        self.assertEqual(response.status_code, 200)
+        self.created_product_id = None
+        texts = [s["text"] for s in requests.get(f"{self.api_url}/products/suggest", params={"q": "gold band of"}).json()]
+        self.assertNotIn(renamed, texts)
+        print("✅ Suggestions for repeated words successful")
+
+def load_server():
+    """Import the backend module for tests that exercise it in process"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+    import server
+    return server
+
+class ImagePairValidationTest(unittest.TestCase):
+    """Test image pair validation against fixtures served by a local http.server"""
+
+    @classmethod
+    def setUpClass(cls):
+        from PIL import Image, ImageDraw
+        cls.server = load_server()
+
+        def encode(image):
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=90)
+            return buffer.getvalue()
+
+        ring = Image.new("RGB", (800, 800), (236, 226, 208))
+        draw = ImageDraw.Draw(ring)
+        draw.ellipse((200, 200, 600, 600), outline=(191, 149, 63), width=40)
+        draw.ellipse((370, 150, 430, 210), fill=(180, 210, 240))
+        stripes = Image.new("RGB", (800, 800), (20, 40, 120))
+        draw = ImageDraw.Draw(stripes)
+        for top in range(0, 800, 100):
+            draw.rectangle((0, top, 800, top + 50), fill=(240, 240, 250))
+        fixtures = {
+            "/ring.jpg": encode(ring),
+            "/ring-small.jpg": encode(ring.resize((400, 400))),
+            "/stripes.jpg": encode(stripes),
+        }
+        # Full responses served per request path, to tell downloads from revalidations
+        cls.downloads = {}
+        cls.hosts = {}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/redirect.jpg"):
+                    self.send_response(302)
+                    self.send_header("Location", f"http://127.0.0.1:{self.server.server_address[1]}/ring.jpg")
+                    self.end_headers()
+                    return
+                if self.path.startswith("/no-location.jpg"):
+                    self.send_response(302)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = fixtures.get(self.path.split("?")[0])
+                if body is None:
+                    self.send_error(404)
+                    return
+                etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                ImagePairValidationTest.downloads[self.path] = ImagePairValidationTest.downloads.get(self.path, 0) + 1
+                ImagePairValidationTest.hosts[self.path] = self.headers.get("Host")
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        cls.image_server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=cls.image_server.serve_forever, daemon=True).start()
+        cls.image_base = f"http://127.0.0.1:{cls.image_server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.image_server.shutdown()
+        cls.image_server.server_close()
+
+    def validate(self, product_path, model_path, mode="strict", base=None, allowed_hosts=("127.0.0.1",)):
+        # A fresh query string per call keeps the fingerprint cache out of the way
+        token = uuid.uuid4().hex
+        base = base or self.image_base
+
+        async def run():
+            try:
+                return await self.server.validate_model_image(
+                    f"{base}{product_path}?{token}", f"{base}{model_path}?{token}"
+                )
+            finally:
+                # The pooled client belongs to this event loop
+                await self.server.get_http_client().aclose()
+                self.server.http_client = None
+
+        with mock.patch.object(self.server, "db", None), \
+                mock.patch.object(self.server, "IMAGE_VALIDATION_MODE", mode), \
+                mock.patch.object(self.server, "IMAGE_ALLOWED_HOSTS", set(allowed_hosts)):
+            return asyncio.run(run())
+
+    def test_01_matching_pair(self):
+        validation = self.validate("/ring.jpg", "/ring-small.jpg")
+        self.assertTrue(validation.matches)
+        self.assertGreaterEqual(validation.similarity, self.server.IMAGE_MATCH_THRESHOLD)
+        self.assertIsNone(validation.detail)
+
+    def test_02_mismatched_pair(self):
+        validation = self.validate("/ring.jpg", "/stripes.jpg")
+        self.assertFalse(validation.matches)
+        self.assertLess(validation.similarity, self.server.IMAGE_MATCH_THRESHOLD)
+        self.assertIn("Image similarity", validation.detail)
+
+        # Lenient mode only records the score
+        validation = self.validate("/ring.jpg", "/stripes.jpg", mode="lenient")
+        self.assertTrue(validation.matches)
+        self.assertIn("Image similarity", validation.detail)
+
+    def test_03_missing_image(self):
+        validation = self.validate("/ring.jpg", "/missing.jpg")
+        self.assertFalse(validation.matches)
+        self.assertTrue(validation.retryable)
+        self.assertIn("HTTP 404", validation.detail)
+
+        validation = self.validate("/ring.jpg", "/missing.jpg", mode="lenient")
+        self.assertTrue(validation.matches)
+
+    def test_04_oversized_image(self):
+        with mock.patch.object(self.server, "IMAGE_MAX_BYTES", 1024):
+            validation = self.validate("/ring.jpg", "/ring-small.jpg")
+        self.assertFalse(validation.matches)
+        self.assertIn("larger than 1024 bytes", validation.detail)
+
+    def test_05_private_address(self):
+        validation = self.validate("/ring.jpg", "/ring-small.jpg", allowed_hosts=())
+        self.assertFalse(validation.matches)
+        self.assertIn("non-public address", validation.detail)
+
+        # An allowed host cannot redirect to one that is not
+        port = self.image_server.server_address[1]
+        validation = self.validate("/ring.jpg", "/redirect.jpg", base=f"http://localhost:{port}", allowed_hosts=("localhost",))
+        self.assertFalse(validation.matches)
+        self.assertIn("127.0.0.1", validation.detail)
+        self.assertIn("non-public address", validation.detail)
+
+    def test_06_revalidated_fingerprint(self):
+        path = f"/ring.jpg?{uuid.uuid4().hex}"
+        store = self.server.FingerprintStore(16)
+
+        async def run():
+            try:
+                return [await store.get(f"{self.image_base}{path}") for _ in range(3)]
+            finally:
+                await self.server.get_http_client().aclose()
+                self.server.http_client = None
+
+        # Expired at once, so later lookups send If-None-Match and get a 304
+        with mock.patch.object(self.server, "db", None), \
+                mock.patch.object(self.server, "IMAGE_FINGERPRINT_MAX_AGE", 0), \
+                mock.patch.object(self.server, "IMAGE_ALLOWED_HOSTS", {"127.0.0.1"}):
+            first, second, third = asyncio.run(run())
+        self.assertEqual(first.phash, second.phash)
+        self.assertEqual(first.phash, third.phash)
+        self.assertEqual(store.stats()["downloads"], 1)
+        self.assertEqual(store.stats()["revalidated"], 2)
+        self.assertEqual(store.stats()["hits"], 0)
+        self.assertEqual(self.downloads[path], 1)
+
+    def test_07_connects_to_checked_address(self):
+        # The name does not resolve, so the request can only succeed if it goes to the
+        # address check_image_host returned
+        port = self.image_server.server_address[1]
+        path = f"/ring.jpg?{uuid.uuid4().hex}"
+
+        async def run():
+            try:
+                return await self.server.fetch_image(f"http://images.invalid:{port}{path}")
+            finally:
+                await self.server.get_http_client().aclose()
+                self.server.http_client = None
+
+        with mock.patch.object(self.server, "check_image_host", mock.AsyncMock(return_value="127.0.0.1")):
+            data, _ = asyncio.run(run())
+        self.assertTrue(data)
+        self.assertEqual(self.hosts[path], f"images.invalid:{port}")
+
+    def test_08_redirect_without_location(self):
+        validation = self.validate("/ring.jpg", "/no-location.jpg")
+        self.assertFalse(validation.matches)
+        self.assertIn("HTTP 302 without a Location", validation.detail)
+
+class SlowQueryExplainTest(unittest.TestCase):
+    """Test explaining slow queries captured from driver command events"""
+
+    def setUp(self):
+        self.server = load_server()
+        self.explain_result = {
+            "queryPlanner": {"winningPlan": {"stage": "UPDATE", "inputStage": {"stage": "COLLSCAN"}}},
+            "executionStats": {"totalDocsExamined": 5000, "totalKeysExamined": 0, "nReturned": 1, "executionTimeMillis": 180},
+        }
+        self.database = mock.MagicMock()
+        self.database.command = mock.AsyncMock(return_value=self.explain_result)
+
+    def record(self, name, command):
+        log = self.server.SlowQueryLog()
+
+        async def run():
+            log.record("premium_jewelry", name, "products", command, 0.25)
+            await asyncio.sleep(0)
+            while log.explaining:
+                await asyncio.sleep(0.01)
+
+        with mock.patch.object(self.server, "client", {"premium_jewelry": self.database}):
+            asyncio.run(run())
+        return log
+
+    def test_01_explain_retryable_find_and_modify(self):
+        # As sent by the driver for find_one_and_update with retryable writes
+        command = {
+            "findAndModify": "products",
+            "query": {"id": "0b6d8c1e", "version": 3},
+            "update": {"$set": {"price": 10.0}, "$inc": {"version": 1}},
+            "new": True,
+            "txnNumber": 7,
+            "lsid": {"id": "session"},
+            "writeConcern": {"w": "majority"},
+            "readConcern": {"level": "local"},
+            "$db": "premium_jewelry",
+            "$clusterTime": {"clusterTime": 1},
+        }
+        log = self.record("findAndModify", command)
+
+        explained = self.database.command.await_args.args[0]["explain"]
+        self.assertEqual(
+            explained,
+            {"findAndModify": "products", "query": command["query"], "update": command["update"], "new": True},
+        )
+        entry = next(iter(log.entries.values()))
+        self.assertEqual(entry["filter"], {"id": "?", "version": "?"})
+        self.assertEqual(entry["plan"]["stages"], ["UPDATE", "COLLSCAN"])
+        self.assertTrue(entry["plan"]["collection_scan"])
+        self.assertEqual(entry["plan"]["docs_examined"], 5000)
+
+class ProductChangeStreamTest(unittest.TestCase):
+    """Test applying products change-stream events to the local caches and indexes"""
+
+    def setUp(self):
+        self.server = load_server()
+        self.server.search_index.clear()
+        self.product = {
+            "_id": "665f1c2e9b1e8a0012345678",
+            "id": str(uuid.uuid4()),
+            "name": "Sapphire Halo Ring",
+            "description": "Oval sapphire framed by diamonds",
+            "category": "Rings",
+            "material_details": {"material": "Platinum", "gemstones": "Sapphire", "origin": "Sri Lanka"},
+            "is_featured": False,
+            "image_url": "https://images.example.com/ring.jpg",
+            "model_image_url": "https://images.example.com/ring-model.jpg",
+        }
+        self.server.search_index.add(self.product)
+
+    def apply(self, updated_fields, removed_fields=()):
+        # The looked-up document differs, so any reindex would show in the search results
+        change = {
+            "operationType": "update",
+            "documentKey": {"_id": self.product["_id"]},
+            "updateDescription": {"updatedFields": updated_fields, "removedFields": list(removed_fields)},
+            "fullDocument": {**self.product, "name": "Emerald Cocktail Ring", **updated_fields},
+        }
+        with mock.patch.object(self.server, "schedule_image_indexing") as schedule:
+            asyncio.run(self.server.apply_product_changes([change]))
+        return schedule
+
+    def test_01_crawler_write_is_ignored(self):
+        generation = self.server.product_cache.generation
+        result = {"url": self.product["image_url"], "status": "ok", "latency_ms": 120.0}
+        # First crawl creates the subdocument, later ones set fields inside it
+        for updated_fields in ({"image_health": {"image_url": result}}, {"image_health.model_image_url": result}):
+            schedule = self.apply(updated_fields)
+            schedule.assert_not_called()
+        self.assertEqual(self.server.product_cache.generation, generation)
+        self.assertEqual(self.server.search_index.search("sapphire", 10), [self.product["id"]])
+        self.assertEqual(self.server.search_index.search("emerald", 10), [])
+
+    def test_02_product_write_is_applied(self):
+        generation = self.server.product_cache.generation
+        schedule = self.apply({"name": "Emerald Cocktail Ring", "image_health.image_url": {"status": "ok"}})
+        schedule.assert_called_once()
+        self.assertGreater(self.server.product_cache.generation, generation)
+        self.assertEqual(self.server.search_index.search("emerald", 10), [self.product["id"]])
+
+        generation = self.server.product_cache.generation
+        self.apply({"image_health.image_url": {"status": "ok"}}, removed_fields=["is_featured"])
+        self.assertGreater(self.server.product_cache.generation, generation)
+
 if __name__ == "__main__":
     print(f"Testing Premium Jewelry API at: {API_URL}")
     unittest.main(argv=['first-arg-is-ignored'], exit=False)
\ No newline at end of file
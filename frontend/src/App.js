@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useCallback, useRef } from "react";
 import "./App.css";
 import axios from "axios";
 
@@ -7,6 +7,9 @@ const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001'
 const API = `${BACKEND_URL}/api`;
 console.log('Using backend URL:', BACKEND_URL);
 
+// Product photos are served resized by the backend image proxy
+const productImage = (product, kind, width) => `${API}/images/${product.id}/${kind}?w=${width}`;
+
 // Header Component
 const Header = ({ currentPage, setCurrentPage }) => {
   return (
@@ -84,14 +87,14 @@ const ProductDetailsModal = ({ product, isOpen, onClose }) => {
           <div className="modal-images">
             <div className="main-image">
               <img 
-                src={product.image_url} 
+                src={productImage(product, 'image', 1280)} 
                 alt={product.name} 
                 className="modal-product-image"
               />
             </div>
             <div className="model-image">
               <img 
-                src={product.model_image_url} 
+                src={productImage(product, 'model', 1280)} 
                 alt={`${product.name} worn by model`} 
                 className="modal-model-image"
               />
@@ -153,14 +156,16 @@ const ProductCard = ({ product, onViewDetails }) => {
     <div className="product-card">
       <div className="product-image-container">
         <img 
-          src={product.image_url} 
+          src={productImage(product, 'image', 640)} 
           alt={product.name} 
           className="product-image product-image-main"
+          loading="lazy"
         />
         <img 
-          src={product.model_image_url} 
+          src={productImage(product, 'model', 640)} 
           alt={`${product.name} worn by model`} 
           className="product-image product-image-model"
+          loading="lazy"
         />
         {product.is_featured && (
           <span className="featured-badge">Featured</span>
@@ -221,13 +226,58 @@ const HomePage = ({ featuredProducts, onViewDetails }) => {
 };
 
 // Products Page Component
-const ProductsPage = ({ products, onViewDetails }) => {
+const ProductsPage = ({ categories, onViewDetails }) => {
   const [selectedCategory, setSelectedCategory] = useState('All');
-  const categories = ['All', ...new Set(products.map(p => p.category))];
-  
-  const filteredProducts = selectedCategory === 'All' 
-    ? products 
-    : products.filter(p => p.category === selectedCategory);
+  const [filteredProducts, setFilteredProducts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const request = useRef(null);
+
+  // Filtering happens server-side so only the selected category is downloaded;
+  // products still awaiting (or failing) image validation are not shown. Results
+  // come a page at a time, following the X-Next-Cursor header
+  const loadProducts = useCallback((cursor) => {
+    // Any request still running belongs to another category or page
+    if (request.current) {
+      request.current.abort();
+    }
+    const controller = new AbortController();
+    request.current = controller;
+    const params = { validation_status: 'validated' };
+    if (selectedCategory !== 'All') {
+      params.category = selectedCategory;
+    }
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    setLoadingMore(Boolean(cursor));
+    axios.get(`${API}/products`, { params, signal: controller.signal })
+      .then(response => {
+        if (controller.signal.aborted) {
+          return;
+        }
+        setFilteredProducts(previous => cursor ? [...previous, ...response.data] : response.data);
+        setNextCursor(response.headers['x-next-cursor'] || null);
+      })
+      .catch(error => {
+        if (!axios.isCancel(error)) {
+          console.error('Error fetching products:', error);
+        }
+      })
+      .finally(() => {
+        if (request.current === controller) {
+          request.current = null;
+          setLoadingMore(false);
+        }
+      });
+  }, [selectedCategory]);
+
+  useEffect(() => {
+    setFilteredProducts([]);
+    setNextCursor(null);
+    loadProducts(null);
+    return () => request.current && request.current.abort();
+  }, [loadProducts]);
 
   return (
     <div className="page">
@@ -235,7 +285,7 @@ const ProductsPage = ({ products, onViewDetails }) => {
         <h1 className="page-title">Our Collections</h1>
         
         <div className="category-filters">
-          {categories.map(category => (
+          {['All', ...categories].map(category => (
             <button 
               key={category}
               onClick={() => setSelectedCategory(category)}
@@ -255,6 +305,18 @@ const ProductsPage = ({ products, onViewDetails }) => {
             />
           ))}
         </div>
+        
+        {nextCursor && (
+          <div className="load-more">
+            <button 
+              onClick={() => loadProducts(nextCursor)}
+              className="load-more-button"
+              disabled={loadingMore}
+            >
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -443,7 +505,7 @@ const ContactPage = () => {
 // Main App Component
 function App() {
   const [currentPage, setCurrentPage] = useState('home');
-  const [products, setProducts] = useState([]);
+  const [categories, setCategories] = useState([]);
   const [featuredProducts, setFeaturedProducts] = useState([]);
   const [loading, setLoading] = useState(true);
   const [selectedProduct, setSelectedProduct] = useState(null);
@@ -465,12 +527,14 @@ function App() {
         // Initialize sample data first
         await axios.post(`${API}/init-data`);
         
-        // Fetch all products
-        const productsResponse = await axios.get(`${API}/products`);
-        setProducts(productsResponse.data);
+        // Fetch the category list for the collections page
+        const categoriesResponse = await axios.get(`${API}/products/categories`);
+        setCategories(categoriesResponse.data);
         
         // Fetch featured products
-        const featuredResponse = await axios.get(`${API}/products/featured`);
+        const featuredResponse = await axios.get(`${API}/products/featured`, {
+          params: { validation_status: 'validated' }
+        });
         setFeaturedProducts(featuredResponse.data);
         
         setLoading(false);
@@ -497,7 +561,7 @@ function App() {
       case 'home':
         return <HomePage featuredProducts={featuredProducts} onViewDetails={handleViewDetails} />;
       case 'products':
-        return <ProductsPage products={products} onViewDetails={handleViewDetails} />;
+        return <ProductsPage categories={categories} onViewDetails={handleViewDetails} />;
       case 'about':
         return <AboutPage />;
       case 'contact':